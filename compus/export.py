@@ -0,0 +1,100 @@
+import csv
+import io
+import json
+from datetime import date
+from enum import Enum
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import Select, select
+
+from core.database import database
+from compus.models import (
+    Campus,
+    Building,
+    Room,
+    RoomItems,
+)
+from compus.schemes import ExportFormat
+
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_COLUMNS = (
+    RoomItems.id,
+    RoomItems.name,
+    RoomItems.quantity,
+    RoomItems.data,
+    RoomItems.status,
+    RoomItems.request_id,
+    Room.id.label('room_id'),
+    Room.name.label('room_name'),
+    Room.floor.label('room_floor'),
+    Building.id.label('building_id'),
+    Building.tip.label('building_tip'),
+    Campus.id.label('campus_id'),
+    Campus.name.label('campus_name'),
+)
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+
+def room_items_export_query(
+        campus_id: Optional[int] = None,
+        building_id: Optional[int] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None) -> Select:
+    query = (
+        select(*EXPORT_COLUMNS)
+        .join(Room, RoomItems.room_id == Room.id)
+        .join(Building, Room.building_id == Building.id)
+        .join(Campus, Building.campus_id == Campus.id)
+        .order_by(RoomItems.id)
+    )
+    if campus_id is not None:
+        query = query.filter(Campus.id == campus_id)
+    if building_id is not None:
+        query = query.filter(Building.id == building_id)
+    if date_from is not None:
+        query = query.filter(RoomItems.data >= date_from)
+    if date_to is not None:
+        query = query.filter(RoomItems.data <= date_to)
+    return query
+
+
+def _export_value(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _ndjson_chunk(rows) -> str:
+    return ''.join(
+        json.dumps({field: _export_value(value) for field, value in zip(EXPORT_FIELDS, row)}) + '\n'
+        for row in rows
+    )
+
+
+def _csv_chunk(rows, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    writer.writerows([_export_value(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+async def stream_room_items(query: Select, export_format: ExportFormat) -> AsyncIterator[str]:
+    """
+    Reads the export through a server-side cursor, ``EXPORT_CHUNK_SIZE`` rows at a time,
+    so memory stays flat whatever the table size is.
+    The session is owned by the generator because the response outlives request dependencies.
+    """
+    async with database.read_session_maker() as session:
+        result = await session.stream(query.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+        if export_format == ExportFormat.csv:
+            yield _csv_chunk([], header=True)
+        async for rows in result.partitions():
+            if export_format == ExportFormat.csv:
+                yield _csv_chunk(rows)
+            else:
+                yield _ndjson_chunk(rows)
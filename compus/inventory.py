@@ -0,0 +1,199 @@
+"""
+Campus inventory summary: rooms, item quantities and open requests per campus and building tip.
+
+Room, room item and request writes apply their deltas in the write transaction with a single
+``INSERT ... ON CONFLICT DO UPDATE``, so the stats endpoint reads a few rows instead of
+scanning the tables. Changes which move whole rooms (room moves and deletes, building
+tip or campus changes, building deletes) recompute the affected campuses instead.
+``python -m tools.rebuild_inventory`` repairs any drift.
+
+Requests have no status yet, so every request counts as open.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Iterable, Optional, Sequence
+
+from sqlalchemy import Row, Select, bindparam, delete, func, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from compus.models import (
+    Building,
+    Room,
+    RoomItems,
+    Request,
+    CampusInventory,
+)
+
+SUMMARY_COLUMNS = ['campus_id', 'tip', 'room_count', 'item_quantity', 'open_request_count']
+
+
+@dataclass
+class Delta:
+    """Change of one building, given directly or through one of its rooms."""
+    building_id: Optional[int] = None
+    room_id: Optional[int] = None
+    rooms: int = 0
+    quantity: int = 0
+    requests: int = 0
+
+
+def array_param(name: str, values: list):
+    return bindparam(name, values, type_=ARRAY(CampusInventory.room_count.type))
+
+
+async def apply_deltas(db: AsyncSession, deltas: Sequence[Delta]) -> None:
+    """Adds all deltas to the summary rows of their campus and tip in one statement."""
+    if not deltas:
+        return
+    # the deltas are sent as five arrays, so the bind parameter count does not grow with the batch
+    delta = func.unnest(
+        array_param('building_ids', [item.building_id for item in deltas]),
+        array_param('room_ids', [item.room_id for item in deltas]),
+        array_param('rooms', [item.rooms for item in deltas]),
+        array_param('quantities', [item.quantity for item in deltas]),
+        array_param('requests', [item.requests for item in deltas]),
+    ).table_valued('building_id', 'room_id', 'rooms', 'quantity', 'requests').render_derived(name='delta')
+
+    totals = (
+        select(
+            Building.campus_id,
+            Building.tip,
+            func.sum(delta.c.rooms),
+            func.sum(delta.c.quantity),
+            func.sum(delta.c.requests),
+        )
+        .select_from(delta)
+        .outerjoin(Room, Room.id == delta.c.room_id)
+        .join(Building, Building.id == func.coalesce(delta.c.building_id, Room.building_id))
+        .filter(Building.campus_id.is_not(None))
+        .group_by(Building.campus_id, Building.tip)
+    )
+    statement = pg_insert(CampusInventory).from_select(SUMMARY_COLUMNS, totals)
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=['campus_id', 'tip'],
+        set_={
+            'room_count': CampusInventory.room_count + statement.excluded.room_count,
+            'item_quantity': CampusInventory.item_quantity + statement.excluded.item_quantity,
+            'open_request_count': CampusInventory.open_request_count + statement.excluded.open_request_count,
+            'updated_at': func.now(),
+        },
+    ))
+
+
+def summary_query(campus_ids: Optional[Iterable[int] | Select] = None) -> Select:
+    """Summary rows computed from scratch, for all campuses or only ``campus_ids``."""
+    rooms_filter = []
+    if campus_ids is not None:
+        rooms_filter.append(Room.building_id.in_(select(Building.id).filter(Building.campus_id.in_(campus_ids))))
+
+    rooms = (
+        select(Room.building_id, func.count(Room.id).label('rooms'))
+        .filter(*rooms_filter)
+        .group_by(Room.building_id)
+        .subquery()
+    )
+    items = (
+        select(Room.building_id, func.sum(RoomItems.quantity).label('quantity'))
+        .join(RoomItems, RoomItems.room_id == Room.id)
+        .filter(*rooms_filter)
+        .group_by(Room.building_id)
+        .subquery()
+    )
+    requests = (
+        select(Room.building_id, func.count(Request.id).label('requests'))
+        .join(Request, Request.room_id == Room.id)
+        .filter(*rooms_filter)
+        .group_by(Room.building_id)
+        .subquery()
+    )
+    query = (
+        select(
+            Building.campus_id,
+            Building.tip,
+            func.coalesce(func.sum(rooms.c.rooms), 0),
+            func.coalesce(func.sum(items.c.quantity), 0),
+            func.coalesce(func.sum(requests.c.requests), 0),
+        )
+        .outerjoin(rooms, rooms.c.building_id == Building.id)
+        .outerjoin(items, items.c.building_id == Building.id)
+        .outerjoin(requests, requests.c.building_id == Building.id)
+        .filter(Building.campus_id.is_not(None))
+        .group_by(Building.campus_id, Building.tip)
+    )
+    if campus_ids is not None:
+        query = query.filter(Building.campus_id.in_(campus_ids))
+    return query
+
+
+async def rebuild_inventory(db: AsyncSession, campus_ids: Optional[Iterable[int] | Select] = None) -> None:
+    """
+    Replaces the summary rows of ``campus_ids`` (every campus when None) in the current transaction.
+
+    :param campus_ids: campus ids or a select of them
+    """
+    if campus_ids is not None and not isinstance(campus_ids, Select):
+        campus_ids = list(set(campus_ids) - {None})
+        if not campus_ids:
+            return
+    stale = delete(CampusInventory)
+    if campus_ids is not None:
+        stale = stale.where(CampusInventory.campus_id.in_(campus_ids))
+    await db.execute(stale)
+    await db.execute(pg_insert(CampusInventory).from_select(SUMMARY_COLUMNS, summary_query(campus_ids)))
+
+
+async def building_changed(db: AsyncSession, old: Sequence[Row], new: Sequence[Row]) -> None:
+    new_by_id = {row.id: row for row in new}
+    campus_ids = set()
+    for row in old:
+        updated = new_by_id.get(row.id)
+        if updated is None:
+            campus_ids.add(row.campus_id)
+        elif (updated.campus_id, updated.tip) != (row.campus_id, row.tip):
+            campus_ids.update((row.campus_id, updated.campus_id))
+    # new buildings have no rooms yet
+    await rebuild_inventory(db, campus_ids)
+
+
+async def room_changed(db: AsyncSession, old: Sequence[Row], new: Sequence[Row]) -> None:
+    new_by_id = {row.id: row for row in new}
+    building_ids = set()
+    for row in old:
+        updated = new_by_id.get(row.id)
+        # a moved or deleted room takes its items and requests along
+        if updated is None or updated.building_id != row.building_id:
+            building_ids.add(row.building_id)
+            if updated is not None:
+                building_ids.add(updated.building_id)
+    if building_ids:
+        await rebuild_inventory(
+            db, select(Building.campus_id).filter(Building.id.in_(list(building_ids - {None})))
+        )
+
+    old_ids = {row.id for row in old}
+    await apply_deltas(db, [Delta(building_id=row.building_id, rooms=1) for row in new if row.id not in old_ids])
+
+
+async def room_item_changed(db: AsyncSession, old: Sequence[Row], new: Sequence[Row]) -> None:
+    quantities = defaultdict(int)
+    for row in old:
+        quantities[row.room_id] -= row.quantity or 0
+    for row in new:
+        quantities[row.room_id] += row.quantity or 0
+    await apply_deltas(db, [
+        Delta(room_id=room_id, quantity=quantity)
+        for room_id, quantity in quantities.items() if quantity and room_id is not None
+    ])
+
+
+async def request_changed(db: AsyncSession, old: Sequence[Row], new: Sequence[Row]) -> None:
+    requests = defaultdict(int)
+    for row in old:
+        requests[row.room_id] -= 1
+    for row in new:
+        requests[row.room_id] += 1
+    await apply_deltas(db, [
+        Delta(room_id=room_id, requests=count)
+        for room_id, count in requests.items() if count and room_id is not None
+    ])
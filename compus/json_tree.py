@@ -0,0 +1,130 @@
+"""
+Nested responses assembled by Postgres with ``json_build_object`` and ``json_agg``.
+
+One query returns the finished document as text, which is sent as is: no ORM instances,
+no schema validation and no serialization in Python. Objects follow the fields of the
+Get* schemas, so the output matches the ORM path field for field.
+"""
+from pydantic import BaseModel as Schema
+from sqlalchemy import Enum as SqlEnum, Select, String, Text, case, cast, func, literal_column, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from compus.models import Campus, Building, Room, RoomItems
+from compus.schemes import (
+    GetRoom,
+    GetRoomItems,
+    GetBuilding,
+    GetBuildingRoom,
+    CampusTree,
+    CampusTreeBuilding,
+    CampusTreeRoom,
+)
+
+EMPTY_ARRAY = literal_column("'[]'::json")
+
+
+def json_value(column):
+    # enums are stored by name, responses carry their value
+    if isinstance(column.type, SqlEnum) and column.type.enum_class is not None:
+        return case(
+            {member.name: member.value for member in column.type.enum_class},
+            value=cast(column, String),
+        )
+    return column
+
+
+def json_object(schema: type[Schema], source, **expressions):
+    """``json_build_object`` of the fields of ``schema``, from columns of ``source`` unless given in ``expressions``."""
+    arguments = []
+    for name in schema.model_fields:
+        arguments.append(name)
+        arguments.append(expressions[name] if name in expressions else json_value(getattr(source, name)))
+    return func.json_build_object(*arguments)
+
+
+def json_array(schema: type[Schema], source, order_by, **expressions):
+    return func.coalesce(
+        func.json_agg(aggregate_order_by(json_object(schema, source, **expressions), order_by)),
+        EMPTY_ARRAY,
+    )
+
+
+def room_json_query(room_id: int) -> Select:
+    """/logic_query/get_room as one JSON document, no row when the room, its building or campus is missing."""
+    room_items = (
+        select(json_array(GetRoomItems, RoomItems, RoomItems.id))
+        .filter(RoomItems.room_id == Room.id)
+        .scalar_subquery()
+    )
+    document = func.json_build_object(
+        'room', json_object(GetRoom, Room),
+        'room_items', room_items,
+        'building', json_object(GetBuilding, Building),
+        # the ORM path validates the campus with GetBuildingRoom, whose room_items stay empty
+        'campus', json_object(GetBuildingRoom, Campus, room_items=EMPTY_ARRAY),
+    )
+    return (
+        select(cast(document, Text))
+        .select_from(Room)
+        .join(Building, Building.id == Room.building_id)
+        .join(Campus, Campus.id == Building.campus_id)
+        .filter(Room.id == room_id)
+    )
+
+
+def campus_tree_query(campus_id: int) -> Select:
+    """Campus -> buildings -> rooms with item totals as one JSON document, no row when the campus is missing."""
+    campus_rooms = (
+        select(Room.id)
+        .join(Building, Building.id == Room.building_id)
+        .filter(Building.campus_id == campus_id)
+    )
+    items = (
+        select(
+            RoomItems.room_id,
+            func.count(RoomItems.id).label('item_count'),
+            func.sum(RoomItems.quantity).label('item_quantity'),
+        )
+        .filter(RoomItems.room_id.in_(campus_rooms))
+        .group_by(RoomItems.room_id)
+        .subquery()
+    )
+    rooms = (
+        select(
+            Room.building_id,
+            json_array(
+                CampusTreeRoom, Room, Room.id,
+                item_count=func.coalesce(items.c.item_count, 0),
+                item_quantity=func.coalesce(items.c.item_quantity, 0),
+            ).label('rooms'),
+        )
+        .outerjoin(items, items.c.room_id == Room.id)
+        .filter(Room.id.in_(campus_rooms))
+        .group_by(Room.building_id)
+        .subquery()
+    )
+    buildings = (
+        select(json_array(
+            CampusTreeBuilding, Building, Building.id,
+            rooms=func.coalesce(rooms.c.rooms, EMPTY_ARRAY),
+        ))
+        .outerjoin(rooms, rooms.c.building_id == Building.id)
+        .filter(Building.campus_id == Campus.id)
+        .scalar_subquery()
+    )
+    return (
+        select(cast(json_object(CampusTree, Campus, buildings=buildings), Text))
+        .filter(Campus.id == campus_id)
+    )
+
+
+def campus_tree_version_queries(campus_id: int) -> tuple[Select, ...]:
+    """Row sets the campus tree is built from, for its ETag."""
+    building_ids = select(Building.id).filter(Building.campus_id == campus_id)
+    room_ids = select(Room.id).filter(Room.building_id.in_(building_ids))
+    return (
+        select(Campus.id, Campus.updated_at).filter(Campus.id == campus_id),
+        select(Building.id, Building.updated_at).filter(Building.campus_id == campus_id),
+        select(Room.id, Room.updated_at).filter(Room.id.in_(room_ids)),
+        select(RoomItems.id, RoomItems.updated_at).filter(RoomItems.room_id.in_(room_ids)),
+    )
@@ -0,0 +1,78 @@
+from sqlalchemy.orm import raiseload, selectinload
+from compus.models import (
+    Campus,
+    Building,
+    Room,
+    RoomItems,
+    Request,
+)
+
+# Relationships are lazy by default, every endpoint picks the eager loads it
+# actually serializes. Anything not listed in a plan raises instead of silently
+# issuing extra queries.
+LOAD_PLANS = {
+    Campus: {
+        'flat': (),
+        'with_buildings': (
+            selectinload(Campus.buildings),
+        ),
+        'with_rooms': (
+            selectinload(Campus.buildings).selectinload(Building.rooms),
+        ),
+        'full_tree': (
+            selectinload(Campus.buildings).selectinload(Building.rooms).selectinload(Room.room_items),
+            selectinload(Campus.buildings).selectinload(Building.rooms).selectinload(Room.requests),
+        ),
+    },
+    Building: {
+        'flat': (),
+        'with_campus': (
+            selectinload(Building.campus),
+        ),
+        'with_rooms': (
+            selectinload(Building.rooms),
+        ),
+        'full_tree': (
+            selectinload(Building.campus),
+            selectinload(Building.rooms).selectinload(Room.room_items),
+            selectinload(Building.rooms).selectinload(Room.requests),
+        ),
+    },
+    Room: {
+        'flat': (),
+        'with_items': (
+            selectinload(Room.room_items),
+        ),
+        'with_items_and_campus': (
+            selectinload(Room.room_items),
+            selectinload(Room.building).selectinload(Building.campus),
+        ),
+        'full_tree': (
+            selectinload(Room.room_items),
+            selectinload(Room.requests),
+            selectinload(Room.building).selectinload(Building.campus),
+        ),
+    },
+    RoomItems: {
+        'flat': (),
+        'full_tree': (
+            selectinload(RoomItems.room),
+            selectinload(RoomItems.request),
+        ),
+    },
+    Request: {
+        'flat': (),
+        'full_tree': (
+            selectinload(Request.room),
+            selectinload(Request.room_items),
+        ),
+    },
+}
+
+
+def load_plan(model, name: str) -> tuple:
+    try:
+        options = LOAD_PLANS[model][name]
+    except KeyError:
+        raise ValueError(f'Unknown load plan {name!r} for {model.__name__}')
+    return (*options, raiseload('*'))
@@ -1,5 +1,5 @@
 from core.base import BaseModel
-from sqlalchemy import Column, String, Integer, ForeignKey, Date, Boolean
+from sqlalchemy import Column, String, Integer, BigInteger, ForeignKey, Date, Boolean, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from enum import Enum
 from sqlalchemy import Enum as SqlEnum
@@ -18,7 +18,7 @@ class Campus(BaseModel):
     name = Column(String(250))
     address = Column(String(250))
 
-    buildings = relationship('Building', back_populates='campus', lazy='selectin')
+    buildings = relationship('Building', back_populates='campus', passive_deletes=True)
 
     def __repr__(self):
         return f'<Campus {self.name}>'
@@ -27,12 +27,12 @@ class Campus(BaseModel):
 class Building(BaseModel):
     __tablename__ = 'buildings'
 
-    campus_id = Column(Integer, ForeignKey('campuses.id'))
+    campus_id = Column(Integer, ForeignKey('campuses.id', ondelete='CASCADE'), index=True)
     tip = Column(SqlEnum(BuildingTip), nullable=True)
     floors = Column(Integer)
 
-    campus = relationship('Campus', back_populates='buildings', lazy='selectin')
-    rooms = relationship('Room', back_populates='building', lazy='selectin')
+    campus = relationship('Campus', back_populates='buildings')
+    rooms = relationship('Room', back_populates='building', passive_deletes=True)
 
     def __repr__(self):
         return f'<Building {self.name}>'
@@ -40,14 +40,22 @@ class Building(BaseModel):
 
 class Room(BaseModel):
     __tablename__ = 'rooms'
-
-    building_id = Column(Integer, ForeignKey('buildings.id'))
+    __table_args__ = (
+        # also serves plain building_id lookups, so no separate FK index is needed
+        Index('ix_rooms_building_id_floor', 'building_id', 'floor'),
+        # name search, see compus/search.py
+        Index(
+            'ix_rooms_name_trgm_gist', 'name', postgresql_using='gist', postgresql_ops={'name': 'gist_trgm_ops'},
+        ),
+    )
+
+    building_id = Column(Integer, ForeignKey('buildings.id', ondelete='CASCADE'))
     name = Column(String(250))
     floor = Column(Integer)
 
-    building = relationship('Building', back_populates='rooms', lazy='selectin')
-    room_items = relationship('RoomItems', back_populates='room', lazy='selectin')
-    requests = relationship('Request', back_populates='room', lazy='selectin')
+    building = relationship('Building', back_populates='rooms')
+    room_items = relationship('RoomItems', back_populates='room', passive_deletes=True)
+    requests = relationship('Request', back_populates='room', passive_deletes=True)
 
     def __repr__(self):
         return f'<Room {self.name}>'
@@ -55,16 +63,21 @@ class Room(BaseModel):
 
 class RoomItems(BaseModel):
     __tablename__ = 'room_items'
-
-    request_id = Column(Integer, ForeignKey('requests.id'), nullable=True)
-    room_id = Column(Integer, ForeignKey('rooms.id'))
+    __table_args__ = (
+        Index(
+            'ix_room_items_name_trgm_gist', 'name', postgresql_using='gist', postgresql_ops={'name': 'gist_trgm_ops'},
+        ),
+    )
+
+    request_id = Column(Integer, ForeignKey('requests.id', ondelete='SET NULL'), nullable=True, index=True)
+    room_id = Column(Integer, ForeignKey('rooms.id', ondelete='CASCADE'), index=True)
     name = Column(String(250))
     quantity = Column(Integer, default=0)
     data = Column(Date)
     status = Column(Boolean, default=False)
 
-    room = relationship('Room', back_populates='room_items', lazy='selectin')
-    request = relationship('Request', back_populates='room_items', lazy='selectin')
+    room = relationship('Room', back_populates='room_items')
+    request = relationship('Request', back_populates='room_items')
 
     def __repr__(self):
         return f'<Item {self.name}>'
@@ -73,11 +86,32 @@ class RoomItems(BaseModel):
 class Request(BaseModel):
     __tablename__ = 'requests'
 
-    user_id = Column(Integer)
-    room_id = Column(Integer, ForeignKey('rooms.id'))
+    user_id = Column(Integer, index=True)
+    room_id = Column(Integer, ForeignKey('rooms.id', ondelete='CASCADE'), index=True)
 
-    room = relationship('Room', back_populates='requests', lazy='selectin')
-    room_items = relationship('RoomItems', back_populates='request', lazy='selectin')
+    room = relationship('Room', back_populates='requests')
+    room_items = relationship('RoomItems', back_populates='request', passive_deletes=True)
 
     def __repr__(self):
         return f'<Room {self.room_id}'
+
+
+class CampusInventory(BaseModel):
+    """Totals per campus and building tip, kept up to date by compus.inventory."""
+    __tablename__ = 'campus_inventory_summary'
+    __table_args__ = (
+        UniqueConstraint(
+            'campus_id', 'tip',
+            name='uq_campus_inventory_summary_campus_id_tip',
+            postgresql_nulls_not_distinct=True,
+        ),
+    )
+
+    campus_id = Column(Integer, ForeignKey('campuses.id', ondelete='CASCADE'), nullable=False)
+    tip = Column(SqlEnum(BuildingTip), nullable=True)
+    room_count = Column(Integer, nullable=False, server_default='0')
+    item_quantity = Column(BigInteger, nullable=False, server_default='0')
+    open_request_count = Column(Integer, nullable=False, server_default='0')
+
+    def __repr__(self):
+        return f'<CampusInventory {self.campus_id} {self.tip}>'
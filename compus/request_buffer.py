@@ -0,0 +1,69 @@
+"""
+Write-behind creation of requests for semester-start bursts, see core/write_behind.py.
+
+Submissions are checked against the room cache and acknowledged with their final id; the
+background task inserts them with one ``INSERT ... SELECT FROM unnest(...)`` per batch.
+Rows whose room was deleted in the meantime are skipped by the join with rooms.
+"""
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import DateTime, Integer, bindparam, func, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+
+from compus.inventory import request_changed
+from compus.models import Room, Request
+from core.database import database
+from core.write_behind import WriteBehindBuffer
+from settings import settings
+
+
+async def reserve_request_ids(count: int) -> list[int]:
+    async with database.session_maker() as session:
+        result = await session.execute(
+            select(func.nextval(func.pg_get_serial_sequence(Request.__tablename__, 'id')))
+            .select_from(func.generate_series(1, count))
+        )
+        return list(result.scalars().all())
+
+
+async def insert_requests(rows: list[dict]) -> int:
+    batch = func.unnest(
+        bindparam('ids', [row['id'] for row in rows], type_=ARRAY(Integer)),
+        bindparam('user_ids', [row['user_id'] for row in rows], type_=ARRAY(Integer)),
+        bindparam('room_ids', [row['room_id'] for row in rows], type_=ARRAY(Integer)),
+        bindparam(
+            'submitted_at',
+            [datetime.fromisoformat(row['submitted_at']) for row in rows],
+            type_=ARRAY(DateTime(timezone=True)),
+        ),
+    ).table_valued('id', 'user_id', 'room_id', 'submitted_at').render_derived(name='batch')
+
+    statement = (
+        pg_insert(Request)
+        .from_select(
+            ['id', 'user_id', 'room_id', 'created_at', 'updated_at'],
+            select(batch.c.id, batch.c.user_id, batch.c.room_id, batch.c.submitted_at, batch.c.submitted_at)
+            .join(Room, Room.id == batch.c.room_id),
+        )
+        # replayed spool files may contain rows which made it in before
+        .on_conflict_do_nothing(index_elements=['id'])
+        .returning(*Request.__table__.columns)
+    )
+    async with database.session_maker() as session:
+        result = await session.execute(statement)
+        inserted = result.all()
+        await request_changed(session, [], inserted)
+        await session.commit()
+    return len(inserted)
+
+
+request_buffer = WriteBehindBuffer(
+    name='requests',
+    flush=insert_requests,
+    reserve_ids=reserve_request_ids,
+    flush_interval=settings.write_behind.flush_interval_ms / 1000,
+    max_rows=settings.write_behind.max_rows,
+    max_buffer=settings.write_behind.max_buffer,
+    spool_dir=Path(settings.write_behind.spool_dir),
+)
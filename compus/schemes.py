@@ -1,7 +1,8 @@
 from pydantic import BaseModel, validator
 from typing import Optional, List
 from compus.models import BuildingTip
-from datetime import date
+from datetime import date, datetime
+from enum import Enum
 
 
 ##########################
@@ -112,6 +113,33 @@ class UpdateRoomItems(BaseModel):
     status: Optional[bool] = None
 
 
+class ExportFormat(str, Enum):
+    ndjson = 'ndjson'
+    csv = 'csv'
+
+
+class SearchKind(str, Enum):
+    all = 'all'
+    room = 'room'
+    item = 'item'
+
+
+class SearchResult(BaseModel):
+    kind: SearchKind
+    id: int
+    name: str
+    room_id: int
+    building_id: Optional[int] = None
+    rank: float
+
+    model_config = dict(from_attributes=True)
+
+
+class SearchPage(BaseModel):
+    items: List[SearchResult]
+    next_offset: Optional[int] = None
+
+
 ##########################
 # Request
 ##########################
@@ -128,6 +156,14 @@ class CreateRequest(BaseModel):
     room_id: int
 
 
+class SubmittedRequest(BaseModel):
+    id: int
+    user_id: int
+    room_id: int
+    # False when the request was inserted right away because write-behind is disabled
+    queued: bool
+
+
 class UpdateRequest(BaseModel):
     user_id: Optional[int] = None
     room_id: Optional[int] = None
@@ -165,14 +201,78 @@ class GetBuildingResponse(BaseModel):
     floors: int | None
     total_rooms: int
     rooms: List[GetBuildingRoom] = []
+    next_cursor: Optional[str] = None
+
+    model_config = dict(from_attributes=True)
+
+
+class FloorSummary(BaseModel):
+    floor: Optional[int]
+    rooms: int
+    items: int
+    quantity: int
+    active_items: int
+    inactive_items: int
 
     model_config = dict(from_attributes=True)
 
 
+class GetBuildingSummaryResponse(BaseModel):
+    id: int
+    tip: Optional[str] = None
+    floors: int | None
+    total_rooms: int
+    total_items: int
+    total_quantity: int
+    per_floor: List[FloorSummary] = []
+
+
 class GetBuildingByRoomResponse(BaseModel):
     room: GetRoom
     room_items: Optional[List[GetRoomItems]] = []
     building: GetBuilding
     campus: GetBuildingRoom
 
-    model_config = dict(from_attributes=True)
\ No newline at end of file
+    model_config = dict(from_attributes=True)
+
+
+class TreeAssembly(str, Enum):
+    # ORM objects validated into the response schema
+    orm = 'orm'
+    # the JSON document is built by Postgres in one query
+    database = 'database'
+
+
+class CampusTreeRoom(BaseModel):
+    id: int
+    building_id: int
+    name: str
+    floor: int
+    item_count: int
+    item_quantity: int
+
+
+class CampusTreeBuilding(BaseModel):
+    id: int
+    campus_id: int
+    tip: BuildingTip
+    floors: int
+    rooms: List[CampusTreeRoom] = []
+
+
+class CampusTree(BaseModel):
+    id: int
+    name: str
+    address: str
+    buildings: List[CampusTreeBuilding] = []
+
+
+class GetInventoryStats(BaseModel):
+    campus_id: int
+    tip: Optional[BuildingTip] = None
+    room_count: int
+    item_quantity: int
+    open_request_count: int
+    updated_at: Optional[datetime] = None
+
+    model_config = dict(from_attributes=True)
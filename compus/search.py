@@ -0,0 +1,99 @@
+"""
+Name search over rooms and room items.
+
+Both ``name`` columns have pg_trgm GiST indexes. They serve the substring ILIKE used for
+typeahead as well as the ``%`` similarity operator that tolerates typos, so matching never
+scans the tables. Input shorter than three characters has no trigram an ILIKE could use,
+so it is matched by similarity alone. Results are ranked by word similarity. Every branch
+is ordered by the ``<->>`` word distance with a limit, which the GiST index answers
+nearest first: a broad query reads its top rows from the index instead of sorting every match.
+"""
+from typing import Optional
+
+from sqlalchemy import Float, Select, literal, or_, select, union_all
+
+from compus.models import (
+    Building,
+    Room,
+    RoomItems,
+)
+from compus.schemes import SearchKind
+
+
+LIKE_ESCAPE = '^'
+# shorter input yields no trigram for ILIKE '%..%', the index would have to be read whole
+MIN_SUBSTRING_LENGTH = 3
+
+
+def _like_pattern(text: str) -> str:
+    escaped = text.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2)
+    escaped = escaped.replace('%', LIKE_ESCAPE + '%').replace('_', LIKE_ESCAPE + '_')
+    return f'%{escaped}%'
+
+
+def _matches(column, text: str):
+    similar = column.op('%')(text)
+    if len(text) < MIN_SUBSTRING_LENGTH:
+        return similar
+    return or_(column.ilike(_like_pattern(text), escape=LIKE_ESCAPE), similar)
+
+
+def _distance(column, text: str):
+    # one minus word_similarity(text, column), with the indexed column on the left so GiST can order by it
+    return column.op('<->>', return_type=Float)(text)
+
+
+def _scope(query: Select, campus_id: Optional[int], building_id: Optional[int]) -> Select:
+    if building_id is not None:
+        query = query.filter(Room.building_id == building_id)
+    if campus_id is not None:
+        query = query.filter(Room.building_id.in_(select(Building.id).filter(Building.campus_id == campus_id)))
+    return query
+
+
+def _nearest(query: Select, distance, id_column, top: int) -> Select:
+    # id breaks ties, an incremental sort on top of the index order
+    return query.order_by(distance, id_column).limit(top)
+
+
+def name_search_query(
+        text: str,
+        kind: SearchKind = SearchKind.all,
+        campus_id: Optional[int] = None,
+        building_id: Optional[int] = None,
+        top: int = 21) -> Select:
+    """
+    Matches of ``text`` best first, every row has kind, id, name, room_id, building_id and rank.
+
+    :param top: rows read from every table, at least offset plus limit of the page asked for
+    """
+    queries = []
+    if kind in (SearchKind.all, SearchKind.room):
+        distance = _distance(Room.name, text)
+        queries.append(_nearest(_scope(
+            select(
+                literal(SearchKind.room.value).label('kind'),
+                Room.id,
+                Room.name,
+                Room.id.label('room_id'),
+                Room.building_id,
+                (1 - distance).label('rank'),
+            ).filter(_matches(Room.name, text)),
+            campus_id, building_id,
+        ), distance, Room.id, top))
+    if kind in (SearchKind.all, SearchKind.item):
+        distance = _distance(RoomItems.name, text)
+        queries.append(_nearest(_scope(
+            select(
+                literal(SearchKind.item.value).label('kind'),
+                RoomItems.id,
+                RoomItems.name,
+                RoomItems.room_id,
+                Room.building_id,
+                (1 - distance).label('rank'),
+            ).join(Room, Room.id == RoomItems.room_id).filter(_matches(RoomItems.name, text)),
+            campus_id, building_id,
+        ), distance, RoomItems.id, top))
+
+    matches = (union_all(*queries) if len(queries) > 1 else queries[0]).subquery()
+    return select(matches).order_by(matches.c.rank.desc(), matches.c.kind, matches.c.id)
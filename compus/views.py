@@ -1,15 +1,33 @@
+import asyncio
+from datetime import date, datetime, timezone
 from typing import List, Optional
-from core.database import get_session
-from sqlalchemy import select
-from fastapi import Depends, APIRouter, status, Path, HTTPException
-from sqlalchemy.orm import selectinload
+from core.bulk import MAX_INSERT_STATEMENTS, bulk_insert, check_bulk_size, raise_bulk_errors
+from core.database import get_read_session, get_write_session
+from core.etag import ConditionalRequest, collection_version
+from core.fieldsets import FieldSet
+from core.loader import batch_ids, id_in, loader
+from core.repository import CrudRepository
+from core.pagination import Page, PageParams, paginate
+from core.query_budget import query_budget
+from sqlalchemy import distinct, func, literal, select
+from fastapi import Depends, APIRouter, status, Path, Query, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from core.write_behind import BufferFull
+from settings import settings
 from sqlalchemy.ext.asyncio import AsyncSession
+from compus.export import room_items_export_query, stream_room_items
+from compus.json_tree import campus_tree_query, campus_tree_version_queries, room_json_query
+from compus.request_buffer import request_buffer
+from compus.search import name_search_query
+from compus.inventory import building_changed, room_changed, room_item_changed, request_changed
+from compus.load_plans import load_plan
 from compus.models import (
     Campus,
     Building,
     Room,
     RoomItems,
     Request,
+    CampusInventory,
 )
 from compus.schemes import (
     # Campus #
@@ -28,13 +46,22 @@ from compus.schemes import (
     GetRoomItems,
     CreateRoomItems,
     UpdateRoomItems,
+    ExportFormat,
     # Request #
     GetRequest,
     CreateRequest,
+    SubmittedRequest,
     UpdateRequest,
     # Logic #
     BuildingByFloorData,
     GetBuildingRoom, GetBuildingResponse, GetBuildingByRoomResponse,
+    FloorSummary, GetBuildingSummaryResponse,
+    GetInventoryStats,
+    TreeAssembly,
+    CampusTree,
+    # Search #
+    SearchKind,
+    SearchPage,
 )
 
 router = APIRouter(prefix='/campus', tags=['campus'])
@@ -43,417 +70,717 @@ router_for_room = APIRouter(prefix='/room', tags=['room'])
 router_for_room_item = APIRouter(prefix='/room_item', tags=['room_item'])
 router_for_request = APIRouter(prefix='/request', tags=['request'])
 router_logic_query = APIRouter(prefix='/logic_query', tags=['logic_query'])
+router_search = APIRouter(prefix='/search', tags=['search'])
+
+campus_repository = CrudRepository(
+    Campus, GetCampus, 'Campus not found',
+    options=load_plan(Campus, 'flat'),
+    invalidates=(Campus.buildings, Building.rooms, Room.room_items, Room.requests, Request.room_items),
+    includes=[(Campus.buildings, GetBuilding)],
+)
+building_repository = CrudRepository(
+    Building, GetBuilding, 'Building not found',
+    options=load_plan(Building, 'flat'),
+    invalidates=(Building.rooms, Room.room_items, Room.requests, Request.room_items),
+    on_write=building_changed, tracks=(Building.campus_id, Building.tip),
+    includes=[(Building.campus, GetCampus), (Building.rooms, GetRoom)],
+)
+room_repository = CrudRepository(
+    Room, GetRoom, 'Room not found',
+    options=load_plan(Room, 'flat'), invalidates=(Room.room_items, Room.requests, Request.room_items),
+    on_write=room_changed, tracks=(Room.building_id,),
+    includes=[(Room.building, GetBuilding), (Room.room_items, GetRoomItems), (Room.requests, GetRequest)],
+)
+room_item_repository = CrudRepository(
+    RoomItems, GetRoomItems, 'Room Item not found',
+    options=load_plan(RoomItems, 'flat'),
+    on_write=room_item_changed, tracks=(RoomItems.room_id, RoomItems.quantity),
+    includes=[(RoomItems.room, GetRoom), (RoomItems.request, GetRequest)],
+)
+request_repository = CrudRepository(
+    Request, GetRequest, 'Request not found',
+    options=load_plan(Request, 'flat'), invalidates=(Request.room_items,),
+    on_write=request_changed, tracks=(Request.room_id,),
+    includes=[(Request.room, GetRoom), (Request.room_items, GetRoomItems)],
+)
+
+
+def hot_statements() -> list:
+    """Statements primed on every connection the application lifespan opens at startup."""
+    statements = []
+    for repository in (
+            campus_repository, building_repository, room_repository, room_item_repository, request_repository):
+        statements += repository.hot_statements()
+    return statements
 
 
 #########################
 # campus
 #########################
-@router.get('/get_campuses', response_model=List[GetCampus])
-async def get_campus(db: AsyncSession = Depends(get_session)):
-    result = await db.execute(select(Campus))
-    about_uses = result.scalars().all()
-    return about_uses
-
-
-@router.get('/get_campus_by_id/{about_us_id}', response_model=GetCampus)
-async def get_campus_by_id(db: AsyncSession = Depends(get_session), about_us_id: int = Path()):
-    result = await db.execute(select(Campus).filter(Campus.id == about_us_id))
-    campus = result.scalars().first()
-    if campus is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Campus not found'
-        )
-    return campus
+@router.get('/get_campuses', response_model=Page[GetCampus] | List[GetCampus], dependencies=[query_budget(3)])
+async def get_campus(
+        pagination: PageParams = Depends(),
+        conditional: ConditionalRequest = Depends(),
+        fieldset: FieldSet = Depends(campus_repository.fieldset),
+        db: AsyncSession = Depends(get_read_session)):
+    not_modified = conditional.not_modified(await campus_repository.page_version(db, pagination, fieldset))
+    if not_modified is not None:
+        return not_modified
+    return conditional.tag(await campus_repository.page(db, pagination, fieldset))
+
+
+@router.get('/get_campus_by_id/{about_us_id}', response_model=GetCampus, dependencies=[query_budget(1)])
+async def get_campus_by_id(
+        conditional: ConditionalRequest = Depends(),
+        db: AsyncSession = Depends(get_read_session),
+        about_us_id: int = Path()):
+    cached = await campus_repository.get_cached(db, about_us_id)
+    not_modified = conditional.not_modified(cached['version'])
+    if not_modified is not None:
+        return not_modified
+    return cached['data']
+
+
+@router.get(
+    '/get_campuses_by_ids',
+    response_model=List[GetCampus],
+    dependencies=[query_budget(3)],
+)
+async def get_campuses_by_ids(
+        ids: List[int] = Depends(batch_ids),
+        conditional: ConditionalRequest = Depends(),
+        fieldset: FieldSet = Depends(campus_repository.fieldset),
+        db: AsyncSession = Depends(get_read_session)):
+    not_modified = conditional.not_modified(await campus_repository.get_many_version(db, ids, fieldset))
+    if not_modified is not None:
+        return not_modified
+    return conditional.tag(await campus_repository.get_many(db, ids, fieldset))
 
 
-@router.post('/create_campus', response_model=GetCampus)
-async def create_campus(campus_data: CreateCampus, db: AsyncSession = Depends(get_session)):
-    campus = Campus(**campus_data.dict())
-    db.add(campus)
-    await db.commit()
-    await db.refresh(campus)
-    return campus
+@router.post('/create_campus', response_model=GetCampus, dependencies=[query_budget(1)])
+async def create_campus(campus_data: CreateCampus, db: AsyncSession = Depends(get_write_session)):
+    return await campus_repository.create(db, campus_data.dict())
 
 
-@router.patch('/update_campus/{campus_id}', response_model=GetCampus)
+@router.patch('/update_campus/{campus_id}', response_model=GetCampus, dependencies=[query_budget(1)])
 async def update_campus(
         campus_data: UpdateCampus,
-        db: AsyncSession = Depends(get_session),
+        db: AsyncSession = Depends(get_write_session),
         campus_id: int = Path()):
-    query = await db.execute(select(Campus).filter(Campus.id == campus_id))
-    campus = query.scalars().first()
-
-    if campus is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Campus not found'
-        )
-
-    update_data = campus_data.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(campus, key, value)
-
-    await db.commit()
-    await db.refresh(campus)
-    return campus
-
+    return await campus_repository.update(db, campus_id, campus_data.dict(exclude_unset=True))
 
-@router.delete('/delete_campus/{campus_id}')
-async def delete_campus(campus_id: int = Path(), db: AsyncSession = Depends(get_session)):
-    query = await db.execute(select(Campus).filter(Campus.id == campus_id))
-    campus = query.scalars().first()
 
-    if campus is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Campus not found'
-        )
-
-    await db.delete(campus)
-    await db.commit()
+@router.delete('/delete_campus/{campus_id}', dependencies=[query_budget(1)])
+async def delete_campus(campus_id: int = Path(), db: AsyncSession = Depends(get_write_session)):
+    await campus_repository.delete(db, campus_id)
     return {'detail': 'Successfully deleted'}
 
 
 #########################
 # Building
 #########################
-@router_for_building.get('/get_buildings', response_model=List[GetBuilding])
-async def get_buildings(db: AsyncSession = Depends(get_session)):
-    result = await db.execute(select(Building))
-    buildings = result.scalars().all()
-    return buildings
-
-
-@router_for_building.get('/get_building_by_id/{building_id}', response_model=GetBuilding)
-async def get_building_by_id(db: AsyncSession = Depends(get_session), building_id: int = Path()):
-    result = await db.execute(select(Building).filter(Building.id == building_id))
-    building = result.scalars().first()
-    if building is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Building not found'
-        )
-    return building
-
-
-@router_for_building.post('/create_building', response_model=GetBuilding)
-async def create_building(building_data: CreateBuilding, db: AsyncSession = Depends(get_session)):
-    building = Building(**building_data.dict())
-    db.add(building)
-    await db.commit()
-    await db.refresh(building)
-    return building
+@router_for_building.get(
+    '/get_buildings',
+    response_model=Page[GetBuilding] | List[GetBuilding],
+    dependencies=[query_budget(4)],
+)
+async def get_buildings(
+        pagination: PageParams = Depends(),
+        conditional: ConditionalRequest = Depends(),
+        fieldset: FieldSet = Depends(building_repository.fieldset),
+        db: AsyncSession = Depends(get_read_session)):
+    not_modified = conditional.not_modified(await building_repository.page_version(db, pagination, fieldset))
+    if not_modified is not None:
+        return not_modified
+    return conditional.tag(await building_repository.page(db, pagination, fieldset))
+
+
+@router_for_building.get(
+    '/get_building_by_id/{building_id}',
+    response_model=GetBuilding,
+    dependencies=[query_budget(1)],
+)
+async def get_building_by_id(
+        conditional: ConditionalRequest = Depends(),
+        db: AsyncSession = Depends(get_read_session),
+        building_id: int = Path()):
+    cached = await building_repository.get_cached(db, building_id)
+    not_modified = conditional.not_modified(cached['version'])
+    if not_modified is not None:
+        return not_modified
+    return cached['data']
 
 
-@router_for_building.patch('/update_building/{building_id}', response_model=GetBuilding)
+@router_for_building.get(
+    '/get_buildings_by_ids',
+    response_model=List[GetBuilding],
+    dependencies=[query_budget(4)],
+)
+async def get_buildings_by_ids(
+        ids: List[int] = Depends(batch_ids),
+        conditional: ConditionalRequest = Depends(),
+        fieldset: FieldSet = Depends(building_repository.fieldset),
+        db: AsyncSession = Depends(get_read_session)):
+    not_modified = conditional.not_modified(await building_repository.get_many_version(db, ids, fieldset))
+    if not_modified is not None:
+        return not_modified
+    return conditional.tag(await building_repository.get_many(db, ids, fieldset))
+
+
+@router_for_building.post('/create_building', response_model=GetBuilding, dependencies=[query_budget(1)])
+async def create_building(building_data: CreateBuilding, db: AsyncSession = Depends(get_write_session)):
+    return await building_repository.create(db, building_data.dict())
+
+
+@router_for_building.patch(
+    '/update_building/{building_id}',
+    response_model=GetBuilding,
+    dependencies=[query_budget(3)],
+)
 async def update_buildings(
         building_data: UpdateBuilding,
-        db: AsyncSession = Depends(get_session),
+        db: AsyncSession = Depends(get_write_session),
         building_id: int = Path()):
-    query = await db.execute(select(Building).filter(Building.id == building_id))
-    building = query.scalars().first()
-
-    if building is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Building not found'
-        )
-
-    update_data = building_data.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(building, key, value)
-
-    await db.commit()
-    await db.refresh(building)
-    return building
+    return await building_repository.update(db, building_id, building_data.dict(exclude_unset=True))
 
 
-@router_for_building.delete('/delete_building/{building_id}')
-async def delete_buildings(db: AsyncSession = Depends(get_session), building_id: int = Path()):
-    query = await db.execute(select(Building).filter(Building.id == building_id))
-    building = query.scalars().first()
-
-    if building is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Building not found'
-        )
-
-    await db.delete(building)
-    await db.commit()
+@router_for_building.delete('/delete_building/{building_id}', dependencies=[query_budget(3)])
+async def delete_buildings(db: AsyncSession = Depends(get_write_session), building_id: int = Path()):
+    await building_repository.delete(db, building_id)
     return {'detail': 'Successfully deleted'}
 
 
 #########################
 # Room
 #########################
-@router_for_room.get('/get_rooms', response_model=List[GetRoom])
-async def get_rooms(db: AsyncSession = Depends(get_session)):
-    result = await db.execute(select(Room))
-    rooms = result.scalars().all()
-    return rooms
-
-
-@router_for_room.get('/get_room_by_id/{room_id}', response_model=GetRoom)
-async def get_room_by_id(db: AsyncSession = Depends(get_session), room_id: int = Path()):
-    result = await db.execute(select(Room).filter(Room.id == room_id))
-    room = result.scalars().first()
-    if room is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Room not found'
-        )
-    return room
-
-
-@router_for_room.post('/create_room', response_model=GetRoom)
-async def create_room(room_data: CreateRoom, db: AsyncSession = Depends(get_session)):
-    building_query = await db.execute(select(Building).filter(Building.id == room_data.building_id))
-    building_result = building_query.scalars().first()
-    if building_result.floors < room_data.floor:
+async def check_room_floor(db: AsyncSession, room_id: int, update_data: dict) -> None:
+    """Validates the resulting floor against the resulting building of an updated room."""
+    building_id = literal(update_data['building_id']) if 'building_id' in update_data else Room.building_id
+    floor = literal(update_data['floor']) if 'floor' in update_data else Room.floor
+    query = await db.execute(
+        select(Building.id, Building.floors, floor)
+        .select_from(Room)
+        .outerjoin(Building, Building.id == building_id)
+        .filter(Room.id == room_id)
+    )
+    result = query.first()
+    if result is None:
+        raise room_repository.not_found()
+    found_building_id, floors, floor = result
+    if found_building_id is None:
+        raise building_repository.not_found()
+    if floor is not None and floors < floor:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail='This building has no floor like this'
         )
-    room = Room(**room_data.dict())
-    db.add(room)
-    await db.commit()
-    await db.refresh(room)
-    return room
 
 
-@router_for_room.patch('/update_room/{room_id}', response_model=GetRoom)
-async def update_room(room_data: UpdateRoom, db: AsyncSession = Depends(get_session), room_id: int = Path()):
-    query = await db.execute(select(Room).filter(Room.id == room_id))
-    room = query.scalars().first()
-
-    if room is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Room not found'
-        )
+@router_for_room.get(
+    '/get_rooms',
+    response_model=Page[GetRoom] | List[GetRoom],
+    dependencies=[query_budget(5)],
+)
+async def get_rooms(
+        pagination: PageParams = Depends(),
+        conditional: ConditionalRequest = Depends(),
+        fieldset: FieldSet = Depends(room_repository.fieldset),
+        db: AsyncSession = Depends(get_read_session)):
+    not_modified = conditional.not_modified(await room_repository.page_version(db, pagination, fieldset))
+    if not_modified is not None:
+        return not_modified
+    return conditional.tag(await room_repository.page(db, pagination, fieldset))
+
+
+@router_for_room.get('/get_room_by_id/{room_id}', response_model=GetRoom, dependencies=[query_budget(1)])
+async def get_room_by_id(
+        conditional: ConditionalRequest = Depends(),
+        db: AsyncSession = Depends(get_read_session),
+        room_id: int = Path()):
+    cached = await room_repository.get_cached(db, room_id)
+    not_modified = conditional.not_modified(cached['version'])
+    if not_modified is not None:
+        return not_modified
+    return cached['data']
 
-    building_query = await db.execute(select(Building).filter(Building.id == room.building_id))
-    building_result = building_query.scalars().first()
-    if building_result is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Building not found'
-        )
 
-    if room_data.floor and building_result.floors < room_data.floor:
+@router_for_room.get(
+    '/get_rooms_by_ids',
+    response_model=List[GetRoom],
+    dependencies=[query_budget(5)],
+)
+async def get_rooms_by_ids(
+        ids: List[int] = Depends(batch_ids),
+        conditional: ConditionalRequest = Depends(),
+        fieldset: FieldSet = Depends(room_repository.fieldset),
+        db: AsyncSession = Depends(get_read_session)):
+    not_modified = conditional.not_modified(await room_repository.get_many_version(db, ids, fieldset))
+    if not_modified is not None:
+        return not_modified
+    return conditional.tag(await room_repository.get_many(db, ids, fieldset))
+
+
+@router_for_room.post('/create_room', response_model=GetRoom, dependencies=[query_budget(3)])
+async def create_room(room_data: CreateRoom, db: AsyncSession = Depends(get_write_session)):
+    building_query = await db.execute(select(Building.floors).filter(Building.id == room_data.building_id))
+    floors = building_query.scalars().first()
+    if floors is None:
+        raise building_repository.not_found()
+    if floors < room_data.floor:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail='This building has no floor like this'
         )
+    return await room_repository.create(db, room_data.dict())
 
-    update_data = room_data.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(room, key, value)
 
+@router_for_room.post(
+    '/create_rooms',
+    response_model=List[GetRoom],
+    dependencies=[query_budget(2 + MAX_INSERT_STATEMENTS)],
+)
+async def create_rooms(rooms_data: List[CreateRoom], db: AsyncSession = Depends(get_write_session)):
+    check_bulk_size(rooms_data)
+    building_ids = {room_data.building_id for room_data in rooms_data}
+    buildings_query = await db.execute(
+        select(Building.id, Building.floors).filter(Building.id.in_(list(building_ids)))
+    )
+    floors_by_building = dict(buildings_query.all())
+
+    errors = []
+    for index, room_data in enumerate(rooms_data):
+        if room_data.building_id not in floors_by_building:
+            errors.append({'index': index, 'detail': 'Building not found'})
+        elif floors_by_building[room_data.building_id] < room_data.floor:
+            errors.append({'index': index, 'detail': 'This building has no floor like this'})
+    raise_bulk_errors(errors)
+
+    rooms = await bulk_insert(db, Room, [room_data.dict() for room_data in rooms_data])
+    await room_changed(db, [], rooms)
     await db.commit()
-    await db.refresh(room)
-    return room
+    return rooms
 
 
-@router_for_room.delete('/delete_room/{room_id}')
-async def delete_room(db: AsyncSession = Depends(get_session), room_id: int = Path()):
-    query = await db.execute(select(Room).filter(Room.id == room_id))
-    room = query.scalars().first()
+@router_for_room.patch('/update_room/{room_id}', response_model=GetRoom, dependencies=[query_budget(4)])
+async def update_room(room_data: UpdateRoom, db: AsyncSession = Depends(get_write_session), room_id: int = Path()):
+    update_data = room_data.dict(exclude_unset=True)
+    if 'floor' in update_data or 'building_id' in update_data:
+        await check_room_floor(db, room_id, update_data)
+    return await room_repository.update(db, room_id, update_data)
 
-    if room is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Room not found'
-        )
 
-    await db.delete(room)
-    await db.commit()
+@router_for_room.delete('/delete_room/{room_id}', dependencies=[query_budget(3)])
+async def delete_room(db: AsyncSession = Depends(get_write_session), room_id: int = Path()):
+    await room_repository.delete(db, room_id)
     return {'detail': 'Successfully deleted'}
 
 
 #########################
 # RoomItems
 #########################
-@router_for_room_item.get('/get_room_items', response_model=List[GetRoomItems])
-async def get_room_items(db: AsyncSession = Depends(get_session)):
-    result = await db.execute(select(RoomItems))
-    room_items = result.scalars().all()
-    return room_items
-
-
-@router_for_room_item.get('/get_room_item_by_id/{room_item_id}', response_model=GetRoomItems)
-async def get_room_item_by_id(db: AsyncSession = Depends(get_session), room_item_id: int = Path()):
-    result = await db.execute(select(RoomItems).filter(RoomItems.id == room_item_id))
-    room_item = result.scalars().first()
-    if room_item is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Room Item not found'
-        )
-    return room_item
+@router_for_room_item.get(
+    '/get_room_items',
+    response_model=Page[GetRoomItems] | List[GetRoomItems],
+    dependencies=[query_budget(4)],
+)
+async def get_room_items(
+        pagination: PageParams = Depends(),
+        conditional: ConditionalRequest = Depends(),
+        fieldset: FieldSet = Depends(room_item_repository.fieldset),
+        db: AsyncSession = Depends(get_read_session)):
+    not_modified = conditional.not_modified(await room_item_repository.page_version(db, pagination, fieldset))
+    if not_modified is not None:
+        return not_modified
+    return conditional.tag(await room_item_repository.page(db, pagination, fieldset))
+
+
+@router_for_room_item.get('/export_room_items')
+async def export_room_items(
+        export_format: ExportFormat = Query(ExportFormat.ndjson, alias='format'),
+        campus_id: Optional[int] = None,
+        building_id: Optional[int] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None):
+    query = room_items_export_query(campus_id, building_id, date_from, date_to)
+    media_type = 'text/csv' if export_format == ExportFormat.csv else 'application/x-ndjson'
+    return StreamingResponse(
+        stream_room_items(query, export_format),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="room_items.{export_format.value}"'},
+    )
 
 
-@router_for_room_item.post('/create_room_item', response_model=GetRoomItems)
-async def create_room_item(room_item_data: CreateRoomItems, db: AsyncSession = Depends(get_session)):
-    room_item = RoomItems(**room_item_data.dict())
-    db.add(room_item)
+@router_for_room_item.get(
+    '/get_room_item_by_id/{room_item_id}',
+    response_model=GetRoomItems,
+    dependencies=[query_budget(1)],
+)
+async def get_room_item_by_id(
+        conditional: ConditionalRequest = Depends(),
+        db: AsyncSession = Depends(get_read_session),
+        room_item_id: int = Path()):
+    cached = await room_item_repository.get_cached(db, room_item_id)
+    not_modified = conditional.not_modified(cached['version'])
+    if not_modified is not None:
+        return not_modified
+    return cached['data']
+
+
+@router_for_room_item.get(
+    '/get_room_items_by_ids',
+    response_model=List[GetRoomItems],
+    dependencies=[query_budget(4)],
+)
+async def get_room_items_by_ids(
+        ids: List[int] = Depends(batch_ids),
+        conditional: ConditionalRequest = Depends(),
+        fieldset: FieldSet = Depends(room_item_repository.fieldset),
+        db: AsyncSession = Depends(get_read_session)):
+    not_modified = conditional.not_modified(await room_item_repository.get_many_version(db, ids, fieldset))
+    if not_modified is not None:
+        return not_modified
+    return conditional.tag(await room_item_repository.get_many(db, ids, fieldset))
+
+
+@router_for_room_item.post('/create_room_item', response_model=GetRoomItems, dependencies=[query_budget(2)])
+async def create_room_item(room_item_data: CreateRoomItems, db: AsyncSession = Depends(get_write_session)):
+    return await room_item_repository.create(db, room_item_data.dict())
+
+
+@router_for_room_item.post(
+    '/create_room_items',
+    response_model=List[GetRoomItems],
+    dependencies=[query_budget(3 + MAX_INSERT_STATEMENTS)],
+)
+async def create_room_items(room_items_data: List[CreateRoomItems], db: AsyncSession = Depends(get_write_session)):
+    check_bulk_size(room_items_data)
+    room_ids = {room_item_data.room_id for room_item_data in room_items_data}
+    request_ids = {room_item_data.request_id for room_item_data in room_items_data} - {None}
+    rooms_query = await db.execute(select(Room.id).filter(Room.id.in_(list(room_ids))))
+    existing_rooms = set(rooms_query.scalars().all())
+    existing_requests = set()
+    if request_ids:
+        requests_query = await db.execute(select(Request.id).filter(Request.id.in_(list(request_ids))))
+        existing_requests = set(requests_query.scalars().all())
+
+    errors = []
+    for index, room_item_data in enumerate(room_items_data):
+        if room_item_data.room_id not in existing_rooms:
+            errors.append({'index': index, 'detail': 'Room not found'})
+        elif room_item_data.request_id is not None and room_item_data.request_id not in existing_requests:
+            errors.append({'index': index, 'detail': 'Request not found'})
+    raise_bulk_errors(errors)
+
+    room_items = await bulk_insert(db, RoomItems, [room_item_data.dict() for room_item_data in room_items_data])
+    await room_item_changed(db, [], room_items)
     await db.commit()
-    await db.refresh(room_item)
-    return room_item
+    return room_items
 
 
-@router_for_room_item.patch('/update_room_item/{room_item_id}', response_model=GetRoomItems)
-async def update_room_item(room_item_data: UpdateRoomItems, db: AsyncSession = Depends(get_session),
+@router_for_room_item.patch(
+    '/update_room_item/{room_item_id}',
+    response_model=GetRoomItems,
+    dependencies=[query_budget(2)],
+)
+async def update_room_item(room_item_data: UpdateRoomItems, db: AsyncSession = Depends(get_write_session),
                            room_item_id: int = Path()):
-    query = await db.execute(select(RoomItems).filter(RoomItems.id == room_item_id))
-    room_item = query.scalars().first()
+    return await room_item_repository.update(db, room_item_id, room_item_data.dict(exclude_unset=True))
 
-    if room_item is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Room Item not found'
-        )
-
-    update_data = room_item_data.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(room_item, key, value)
-
-    await db.commit()
-    await db.refresh(room_item)
-    return room_item
 
-
-@router_for_room_item.delete('/delete_room_item/{room_item_id}')
-async def delete_room_item(db: AsyncSession = Depends(get_session), room_item_id: int = Path()):
-    query = await db.execute(select(RoomItems).filter(RoomItems.id == room_item_id))
-    room_item = query.scalars().first()
-
-    if room_item is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Room Item not found'
-        )
-
-    await db.delete(room_item)
-    await db.commit()
+@router_for_room_item.delete('/delete_room_item/{room_item_id}', dependencies=[query_budget(2)])
+async def delete_room_item(db: AsyncSession = Depends(get_write_session), room_item_id: int = Path()):
+    await room_item_repository.delete(db, room_item_id)
     return {'detail': 'Successfully deleted'}
 
 
 #########################
 # Request
 #########################
-@router_for_request.get('/get_requests', response_model=List[GetRequest])
-async def get_requests(db: AsyncSession = Depends(get_session)):
-    result = await db.execute(select(Request))
-    requests = result.scalars().all()
-    return requests
-
-
-@router_for_request.get('/get_request_by_id/{request_id}', response_model=GetRequest)
-async def get_request_by_id(db: AsyncSession = Depends(get_session), request_id: int = Path()):
-    result = await db.execute(select(Request).filter(Request.id == request_id))
-    request = result.scalarbuildingss().first()
-    if request is None:
+@router_for_request.get(
+    '/get_requests',
+    response_model=Page[GetRequest] | List[GetRequest],
+    dependencies=[query_budget(4)],
+)
+async def get_requests(
+        pagination: PageParams = Depends(),
+        conditional: ConditionalRequest = Depends(),
+        fieldset: FieldSet = Depends(request_repository.fieldset),
+        db: AsyncSession = Depends(get_read_session)):
+    not_modified = conditional.not_modified(await request_repository.page_version(db, pagination, fieldset))
+    if not_modified is not None:
+        return not_modified
+    return conditional.tag(await request_repository.page(db, pagination, fieldset))
+
+
+@router_for_request.get(
+    '/get_request_by_id/{request_id}',
+    response_model=GetRequest,
+    dependencies=[query_budget(1)],
+)
+async def get_request_by_id(
+        conditional: ConditionalRequest = Depends(),
+        db: AsyncSession = Depends(get_read_session),
+        request_id: int = Path()):
+    cached = await request_repository.get_cached(db, request_id)
+    not_modified = conditional.not_modified(cached['version'])
+    if not_modified is not None:
+        return not_modified
+    return cached['data']
+
+
+@router_for_request.get(
+    '/get_requests_by_ids',
+    response_model=List[GetRequest],
+    dependencies=[query_budget(4)],
+)
+async def get_requests_by_ids(
+        ids: List[int] = Depends(batch_ids),
+        conditional: ConditionalRequest = Depends(),
+        fieldset: FieldSet = Depends(request_repository.fieldset),
+        db: AsyncSession = Depends(get_read_session)):
+    not_modified = conditional.not_modified(await request_repository.get_many_version(db, ids, fieldset))
+    if not_modified is not None:
+        return not_modified
+    return conditional.tag(await request_repository.get_many(db, ids, fieldset))
+
+
+@router_for_request.post('/create_request', response_model=GetRequest, dependencies=[query_budget(2)])
+async def create_request(request_data: CreateRequest, db: AsyncSession = Depends(get_write_session)):
+    return await request_repository.create(db, request_data.dict())
+
+
+@router_for_request.post(
+    '/submit_request',
+    response_model=SubmittedRequest,
+    status_code=status.HTTP_202_ACCEPTED,
+    responses={status.HTTP_201_CREATED: {'model': SubmittedRequest, 'description': 'Inserted right away'}},
+    dependencies=[query_budget(3)],
+)
+async def submit_request(
+        request_data: CreateRequest,
+        response: Response,
+        db: AsyncSession = Depends(get_write_session)):
+    """
+    Like /create_request, but queued and inserted in a batch shortly after when write-behind is
+    enabled. The returned id is final; the request becomes readable once its batch is flushed.
+    Answers 202 when queued and 201 when write-behind is disabled and the request was inserted.
+    """
+    # validated here, the flush skips rooms deleted in the meantime
+    await room_repository.get_cached(db, request_data.room_id)
+    if not settings.write_behind.enabled:
+        request = await request_repository.create(db, request_data.dict())
+        response.status_code = status.HTTP_201_CREATED
+        return SubmittedRequest(id=request.id, user_id=request.user_id, room_id=request.room_id, queued=False)
+    try:
+        row = await request_buffer.submit({
+            **request_data.dict(),
+            'submitted_at': datetime.now(timezone.utc).isoformat(),
+        })
+    except BufferFull:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Request not found'
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Too many requests are waiting to be saved, retry later',
+            headers={'Retry-After': '1'},
         )
-    return request
+    return SubmittedRequest(id=row['id'], user_id=row['user_id'], room_id=row['room_id'], queued=True)
 
 
-@router_for_request.post('/create_request', response_model=GetRequest)
-async def create_request(request_data: CreateRequest, db: AsyncSession = Depends(get_session)):
-    request = Request(**request_data.dict())
-    db.add(request)
+@router_for_request.post(
+    '/create_requests',
+    response_model=List[GetRequest],
+    dependencies=[query_budget(2 + MAX_INSERT_STATEMENTS)],
+)
+async def create_requests(requests_data: List[CreateRequest], db: AsyncSession = Depends(get_write_session)):
+    check_bulk_size(requests_data)
+    room_ids = {request_data.room_id for request_data in requests_data}
+    rooms_query = await db.execute(select(Room.id).filter(Room.id.in_(list(room_ids))))
+    existing_rooms = set(rooms_query.scalars().all())
+
+    errors = [
+        {'index': index, 'detail': 'Room not found'}
+        for index, request_data in enumerate(requests_data)
+        if request_data.room_id not in existing_rooms
+    ]
+    raise_bulk_errors(errors)
+
+    requests = await bulk_insert(db, Request, [request_data.dict() for request_data in requests_data])
+    await request_changed(db, [], requests)
     await db.commit()
-    await db.refresh(request)
-    return request
+    return requests
 
 
-@router_for_request.patch('/update_request/{request_id}', response_model=GetRequest)
-async def update_request(request_data: UpdateRequest, db: AsyncSession = Depends(get_session),
+@router_for_request.patch(
+    '/update_request/{request_id}',
+    response_model=GetRequest,
+    dependencies=[query_budget(2)],
+)
+async def update_request(request_data: UpdateRequest, db: AsyncSession = Depends(get_write_session),
                          request_id: int = Path()):
-    query = await db.execute(select(Request).filter(Request.id == request_id))
-    request = query.scalars().first()
-
-    if request is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Request not found'
-        )
+    return await request_repository.update(db, request_id, request_data.dict(exclude_unset=True))
 
-    update_data = request_data.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(request, key, value)
 
-    await db.commit()
-    await db.refresh(request)
-    return request
-
-
-@router_for_request.delete('/delete_request/{request_id}')
-async def delete_request(db: AsyncSession = Depends(get_session), request_id: int = Path()):
-    query = await db.execute(select(Request).filter(Request.id == request_id))
-    request = query.scalars().first()
-
-    if request is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Request not found'
-        )
-
-    await db.delete(request)
-    await db.commit()
+@router_for_request.delete('/delete_request/{request_id}', dependencies=[query_budget(2)])
+async def delete_request(db: AsyncSession = Depends(get_write_session), request_id: int = Path()):
+    await request_repository.delete(db, request_id)
     return {'detail': 'Successfully deleted'}
 
 
 ############################################
 ##
 ############################################
-@router_logic_query.get('/get_rooms/{building_id}', response_model=GetBuildingResponse)
+def building_rooms_filter(building_id: int, floor: Optional[int]) -> list:
+    rooms_filter = [Room.building_id == building_id]
+    if floor is not None:
+        rooms_filter.append(Room.floor == floor)
+    return rooms_filter
+
+
+async def building_rooms_version(db: AsyncSession, building_id: int, rooms_filter: list) -> str:
+    return await collection_version(
+        db,
+        select(Building.id, Building.updated_at).filter(Building.id == building_id),
+        select(Room.id, Room.updated_at).filter(*rooms_filter),
+        select(RoomItems.id, RoomItems.updated_at).filter(
+            RoomItems.room_id.in_(select(Room.id).filter(*rooms_filter))
+        ),
+    )
+
+
+@router_logic_query.get(
+    '/get_rooms/{building_id}',
+    response_model=GetBuildingResponse,
+    dependencies=[query_budget(5)],
+)
 async def get_buildings_by_floor(
         floor: Optional[int] = None,
-        db: AsyncSession = Depends(get_session),
+        include_rooms: bool = True,
+        pagination: PageParams = Depends(),
+        conditional: ConditionalRequest = Depends(),
+        db: AsyncSession = Depends(get_read_session),
         building_id: int = Path()):
-    building_query = await db.execute(select(Building).filter(Building.id == building_id))
-    building_result = building_query.scalars().first()
-    if building_result is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Building not found'
-        )
+    rooms_filter = building_rooms_filter(building_id, floor)
+    not_modified = conditional.not_modified(await building_rooms_version(db, building_id, rooms_filter))
+    if not_modified is not None:
+        return not_modified
+
+    building = (await building_repository.get_cached(db, building_id))['data']
+
+    total_rooms_query = await db.execute(select(func.count(Room.id)).filter(*rooms_filter))
+    rooms, next_cursor = [], None
+    if include_rooms:
+        rooms_query = select(Room).options(*load_plan(Room, 'with_items')).filter(*rooms_filter)
+        rooms_page = await paginate(db, rooms_query, Room.id, pagination)
+        if pagination.legacy:
+            rooms = rooms_page
+        else:
+            rooms, next_cursor = rooms_page['items'], rooms_page['next_cursor']
 
-    rooms_query = select(Room).options(selectinload(Room.room_items)).filter(Room.building_id == building_result.id)
+    return GetBuildingResponse.model_validate(
+        {
+            "id": building['id'],
+            "tip": building['tip'],
+            "floors": floor,
+            "total_rooms": total_rooms_query.scalar(),
+            "rooms": rooms,
+            "next_cursor": next_cursor,
+        }
+    )
 
-    if floor:
-        rooms_query = rooms_query.filter(Room.floor == floor)
 
-    execute_rooms_query = await db.execute(rooms_query)
+@router_logic_query.get(
+    '/get_building_summary/{building_id}',
+    response_model=GetBuildingSummaryResponse,
+    dependencies=[query_budget(3)],
+)
+async def get_building_summary(
+        floor: Optional[int] = None,
+        conditional: ConditionalRequest = Depends(),
+        db: AsyncSession = Depends(get_read_session),
+        building_id: int = Path()):
+    rooms_filter = building_rooms_filter(building_id, floor)
+    not_modified = conditional.not_modified(await building_rooms_version(db, building_id, rooms_filter))
+    if not_modified is not None:
+        return not_modified
+
+    building = (await building_repository.get_cached(db, building_id))['data']
+
+    summary_query = await db.execute(
+        select(
+            Room.floor.label('floor'),
+            func.count(distinct(Room.id)).label('rooms'),
+            func.count(RoomItems.id).label('items'),
+            func.coalesce(func.sum(RoomItems.quantity), 0).label('quantity'),
+            func.count(RoomItems.id).filter(RoomItems.status.is_(True)).label('active_items'),
+            func.count(RoomItems.id).filter(RoomItems.status.is_not(True)).label('inactive_items'),
+        )
+        .select_from(Room)
+        .outerjoin(RoomItems, RoomItems.room_id == Room.id)
+        .filter(*rooms_filter)
+        .group_by(Room.floor)
+        .order_by(Room.floor)
+    )
+    per_floor = summary_query.all()
 
-    rooms_result = execute_rooms_query.scalars().all()
-    return GetBuildingResponse.model_validate(
+    return GetBuildingSummaryResponse.model_validate(
         {
-            "id": building_result.id,
-            "tip": building_result.tip.value,
-            "floors": floor if floor else None,
-            "total_rooms": len(rooms_result),
-            "rooms": rooms_result
+            "id": building['id'],
+            "tip": building['tip'],
+            "floors": building['floors'],
+            "total_rooms": sum(row.rooms for row in per_floor),
+            "total_items": sum(row.items for row in per_floor),
+            "total_quantity": sum(row.quantity for row in per_floor),
+            "per_floor": per_floor,
         }
     )
 
 
-@router_logic_query.get('/get_room/{room_id}')
+async def room_with_parents(db: AsyncSession, room: Room) -> dict:
+    """Building and campus of a room through the session's batch loaders."""
+    building = await loader(db, Building).load(room.building_id)
+    campus = await loader(db, Campus).load(building.campus_id) if building is not None else None
+    return {
+        "room": room,
+        "room_items": room.room_items,
+        "building": building,
+        "campus": campus,
+    }
+
+
+@router_logic_query.get(
+    '/get_room/{room_id}',
+    response_model=GetBuildingByRoomResponse,
+    dependencies=[query_budget(5)],
+)
 async def get_buildings_by_room(
-        db: AsyncSession = Depends(get_session),
-        room_id: int = Path()):
+        conditional: ConditionalRequest = Depends(),
+        db: AsyncSession = Depends(get_read_session),
+        room_id: int = Path(),
+        assembly: TreeAssembly = TreeAssembly.orm):
+    building_id = select(Room.building_id).filter(Room.id == room_id).scalar_subquery()
+    campus_id = select(Building.campus_id).filter(Building.id == building_id).scalar_subquery()
+    version = await collection_version(
+        db,
+        select(Room.id, Room.updated_at).filter(Room.id == room_id),
+        select(RoomItems.id, RoomItems.updated_at).filter(RoomItems.room_id == room_id),
+        select(Building.id, Building.updated_at).filter(Building.id == building_id),
+        select(Campus.id, Campus.updated_at).filter(Campus.id == campus_id),
+    )
+    not_modified = conditional.not_modified(version)
+    if not_modified is not None:
+        return not_modified
+
+    if assembly == TreeAssembly.database:
+        document = (await db.execute(room_json_query(room_id))).scalar()
+        if document is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='Room not found'
+            )
+        return conditional.tag(Response(content=document, media_type='application/json'))
+
     room_query = await db.execute(
         select(Room)
-        .options(
-            selectinload(Room.room_items),
-            selectinload(Room.building).selectinload(Building.campus)
-        )
+        .options(*load_plan(Room, 'with_items'))
         .filter(Room.id == room_id)
     )
     room_result = room_query.scalars().first()
@@ -464,11 +791,112 @@ async def get_buildings_by_room(
             detail='Room not found'
         )
 
-    return GetBuildingByRoomResponse.model_validate(
-        {
-            "room": room_result,
-            "room_items": room_result.room_items,
-            "building": room_result.building,
-            "campus": room_result.building.campus,
-        }
+    return GetBuildingByRoomResponse.model_validate(await room_with_parents(db, room_result))
+
+
+@router_logic_query.get(
+    '/get_campus_tree/{campus_id}',
+    response_model=CampusTree,
+    dependencies=[query_budget(2)],
+)
+async def get_campus_tree(
+        conditional: ConditionalRequest = Depends(),
+        db: AsyncSession = Depends(get_read_session),
+        campus_id: int = Path()):
+    """Buildings of a campus with their rooms and item totals, assembled as JSON by the database."""
+    not_modified = conditional.not_modified(await collection_version(db, *campus_tree_version_queries(campus_id)))
+    if not_modified is not None:
+        return not_modified
+
+    document = (await db.execute(campus_tree_query(campus_id))).scalar()
+    if document is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='Campus not found'
+        )
+    return conditional.tag(Response(content=document, media_type='application/json'))
+
+
+@router_logic_query.get(
+    '/get_rooms_by_ids',
+    response_model=List[GetBuildingByRoomResponse],
+    dependencies=[query_budget(5)],
+)
+async def get_buildings_by_rooms(
+        ids: List[int] = Depends(batch_ids),
+        conditional: ConditionalRequest = Depends(),
+        db: AsyncSession = Depends(get_read_session)):
+    """Batch form of /get_room: buildings and campuses of all rooms are loaded with one query each."""
+    building_ids = select(Room.building_id).filter(id_in(Room.id, ids))
+    campus_ids = select(Building.campus_id).filter(Building.id.in_(building_ids))
+    version = await collection_version(
+        db,
+        select(Room.id, Room.updated_at).filter(id_in(Room.id, ids)),
+        select(RoomItems.id, RoomItems.updated_at).filter(id_in(RoomItems.room_id, ids)),
+        select(Building.id, Building.updated_at).filter(Building.id.in_(building_ids)),
+        select(Campus.id, Campus.updated_at).filter(Campus.id.in_(campus_ids)),
+    )
+    not_modified = conditional.not_modified(version)
+    if not_modified is not None:
+        return not_modified
+
+    rooms_query = await db.execute(
+        select(Room)
+        .options(*load_plan(Room, 'with_items'))
+        .filter(id_in(Room.id, ids))
+    )
+    rooms = {room.id: room for room in rooms_query.scalars().all()}
+    results = await asyncio.gather(*(
+        room_with_parents(db, rooms[room_id]) for room_id in ids if room_id in rooms
+    ))
+    return [GetBuildingByRoomResponse.model_validate(result) for result in results]
+
+
+@router_logic_query.get(
+    '/get_inventory_stats',
+    response_model=List[GetInventoryStats],
+    dependencies=[query_budget(2)],
+)
+async def get_inventory_stats(
+        campus_id: Optional[int] = None,
+        conditional: ConditionalRequest = Depends(),
+        db: AsyncSession = Depends(get_read_session)):
+    """Totals per campus and building tip, read from the incrementally maintained summary table."""
+    query = select(CampusInventory).order_by(CampusInventory.campus_id, CampusInventory.tip)
+    versions = select(CampusInventory.id, CampusInventory.updated_at)
+    if campus_id is not None:
+        query = query.filter(CampusInventory.campus_id == campus_id)
+        versions = versions.filter(CampusInventory.campus_id == campus_id)
+    not_modified = conditional.not_modified(await collection_version(db, versions))
+    if not_modified is not None:
+        return not_modified
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+#########################
+# Search
+#########################
+@router_search.get('/by_name', response_model=SearchPage, dependencies=[query_budget(1)])
+async def search_by_name(
+        q: str = Query(min_length=2, max_length=100),
+        kind: SearchKind = SearchKind.all,
+        campus_id: Optional[int] = None,
+        building_id: Optional[int] = None,
+        limit: int = Query(20, ge=1, le=100),
+        offset: int = Query(0, ge=0, le=1000),
+        conditional: ConditionalRequest = Depends(),
+        db: AsyncSession = Depends(get_read_session)):
+    """Rooms and room items whose name contains or resembles ``q``, best matches first."""
+    result = await db.execute(
+        name_search_query(q, kind, campus_id, building_id, top=offset + limit + 1).limit(limit + 1).offset(offset)
     )
+    rows = result.all()
+    # the page rows hold everything the response shows, a second version query would repeat the search
+    not_modified = conditional.not_modified('|'.join(':'.join(str(value) for value in row) for row in rows))
+    if not_modified is not None:
+        return not_modified
+    return {
+        'items': rows[:limit],
+        'next_offset': offset + limit if len(rows) > limit else None,
+    }
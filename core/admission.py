@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+
+from core.metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUED, ADMISSION_REJECTED, ADMISSION_WAIT
+
+logger = logging.getLogger(__name__)
+
+# never limited, they have to answer while the application is overloaded,
+# or are long-lived streams which hold no connection of the pool
+UNLIMITED_PREFIXES = ('/metrics', '/monitoring', '/docs', '/redoc', '/openapi.json', '/changes/')
+READ_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+
+def route_group(method: str, path: str) -> Optional[str]:
+    """
+    The admission group of a request, decided from the path alone because admission runs before routing.
+
+    Writes are one group whatever the path, reads are split into by-id lookups
+    (``get_*_by_id`` and ``get_*_by_ids``), ``/logic_query``, exports and everything else.
+    Exports hold their slot and their connection for the whole stream, so they get a group
+    of their own instead of starving the short list requests.
+    """
+    if path.startswith(UNLIMITED_PREFIXES):
+        return None
+    if method not in READ_METHODS:
+        return 'write'
+    if '/export_' in path:
+        return 'export'
+    if path.startswith('/logic_query/'):
+        return 'logic'
+    if '_by_id' in path:
+        return 'lookup'
+    return 'list'
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AdmissionGate:
+    """At most ``concurrency`` requests at once, at most ``queue`` more waiting up to ``timeout`` seconds."""
+
+    def __init__(self, name: str, concurrency: int, queue: int, timeout: float) -> None:
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+
+    async def acquire(self) -> None:
+        # locked() is also True while others wait, so a free slot never lets a newcomer overtake the queue
+        if not self.semaphore.locked():
+            await self.semaphore.acquire()
+        else:
+            if self.waiting >= self.queue:
+                raise Rejected('queue_full')
+            self.waiting += 1
+            ADMISSION_QUEUED.labels(self.name).inc()
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                raise Rejected('timeout')
+            finally:
+                self.waiting -= 1
+                ADMISSION_QUEUED.labels(self.name).dec()
+            ADMISSION_WAIT.labels(self.name).observe(time.perf_counter() - start)
+        self.in_flight += 1
+        ADMISSION_IN_FLIGHT.labels(self.name).inc()
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.labels(self.name).dec()
+        self.semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            'concurrency': self.concurrency,
+            'in_flight': self.in_flight,
+            'queue': self.queue,
+            'waiting': self.waiting,
+        }
+
+
+class AdmissionMiddleware:
+    """
+    Load shedding in front of the connection pool.
+
+    Without it every request beyond the pool capacity queues inside SQLAlchemy until
+    ``pool_timeout``, cheap lookups behind slow tree queries. Here every route group has its
+    own concurrency limit and bounded queue, and requests which can not be admitted get a
+    503 with Retry-After right away instead of a timeout half a minute later.
+    """
+
+    def __init__(self, app, admission_settings, pool_capacity: Optional[int] = None) -> None:
+        """:param pool_capacity: pool size plus overflow, the group concurrencies should not add up to more"""
+        self.app = app
+        self.retry_after = admission_settings.retry_after
+        self.gates = {
+            name: AdmissionGate(name, limit.concurrency, limit.queue, admission_settings.queue_timeout_ms / 1000)
+            for name, limit in admission_settings.groups.items()
+        }
+        admission_gates.update(self.gates)
+        admitted = sum(gate.concurrency for gate in self.gates.values())
+        if pool_capacity is not None and admitted > pool_capacity:
+            logger.warning(
+                'admission lets %s requests run at once but the pool holds %s connections, '
+                'the rest will queue inside the pool until DATABASE_POOL_TIMEOUT', admitted, pool_capacity,
+            )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        gate = self.gates.get(route_group(scope['method'], scope['path']))
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await gate.acquire()
+        except Rejected as rejected:
+            ADMISSION_REJECTED.labels(gate.name, rejected.reason).inc()
+            response = JSONResponse(
+                {'detail': 'Server is busy, retry later'},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(self.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
+
+
+# gates of the running application by group, for /monitoring/admission
+admission_gates: dict[str, AdmissionGate] = {}
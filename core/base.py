@@ -11,4 +11,5 @@ class BaseModel(Base):
     id = Column(Integer, primary_key=True)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # also set by the touch_updated_at trigger, so updates made by ON DELETE SET NULL change ETag versions too
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
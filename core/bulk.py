@@ -0,0 +1,48 @@
+from typing import List
+
+from fastapi import HTTPException, status
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+MAX_BULK_SIZE = 10_000
+# rows per multi-row INSERT statement, keeps bind parameters below the asyncpg limit of 32767
+BULK_PAGE_SIZE = 1000
+# INSERT statements needed for the largest accepted batch
+MAX_INSERT_STATEMENTS = -(-MAX_BULK_SIZE // BULK_PAGE_SIZE)
+
+
+def check_bulk_size(items: list) -> None:
+    if not items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Empty batch'
+        )
+    if len(items) > MAX_BULK_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f'Batch is limited to {MAX_BULK_SIZE} items'
+        )
+
+
+def raise_bulk_errors(errors: List[dict]) -> None:
+    """
+    :param errors: list of {"index": position in the payload, "detail": message}
+    """
+    if errors:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=sorted(errors, key=lambda error: error['index'])
+        )
+
+
+async def bulk_insert(db: AsyncSession, model, rows: List[dict]) -> list:
+    """
+    Inserts all rows with multi-row INSERT ... RETURNING statements
+    (insertmanyvalues) in the current transaction. Returned rows keep the payload order.
+    """
+    result = await db.execute(
+        insert(model).returning(*model.__table__.columns, sort_by_parameter_order=True),
+        rows,
+        execution_options={'insertmanyvalues_page_size': BULK_PAGE_SIZE},
+    )
+    return result.all()
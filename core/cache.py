@@ -0,0 +1,210 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Protocol
+
+import settings
+settings = settings.settings
+
+# stored in place of an invalidated entry, serialized entries are JSON objects and never equal it
+TOMBSTONE = '-'
+
+
+class CacheBackend(Protocol):
+    """Shared cache storage used by all workers."""
+
+    async def get(self, key: str) -> Optional[str]: ...
+
+    async def set(self, key: str, value: str, ttl: float) -> None: ...
+
+    async def add(self, key: str, value: str, ttl: float) -> bool:
+        """Stores ``value`` only when ``key`` holds nothing, returns whether it did."""
+
+    async def delete(self, *keys: str) -> None: ...
+
+    async def close(self) -> None: ...
+
+
+class LocalBackend:
+    """
+    In-process stand-in for a shared backend. It is not shared between
+    workers, use it for tests and single worker setups only.
+    """
+
+    def __init__(self) -> None:
+        self._data: dict[str, tuple[str, float]] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        self._data[key] = (value, time.monotonic() + ttl)
+
+    async def add(self, key: str, value: str, ttl: float) -> bool:
+        if await self.get(key) is not None:
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._data.pop(key, None)
+
+    async def close(self) -> None:
+        self._data.clear()
+
+
+class RedisBackend:
+    def __init__(self, url: str, namespace: str = 'fast_lms:') -> None:
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError('CACHE_BACKEND_URL is set but the "redis" package is not installed')
+        self._redis = redis.from_url(url, decode_responses=True)
+        self._namespace = namespace
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._redis.get(self._namespace + key)
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        await self._redis.set(self._namespace + key, value, px=int(ttl * 1000))
+
+    async def add(self, key: str, value: str, ttl: float) -> bool:
+        return bool(await self._redis.set(self._namespace + key, value, px=int(ttl * 1000), nx=True))
+
+    async def delete(self, *keys: str) -> None:
+        await self._redis.delete(*(self._namespace + key for key in keys))
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class LRUCache:
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.evictions = 0
+        self._data: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def add(self, key: str, value: Any) -> None:
+        if self.get(key) is None:
+            self.set(key, value)
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+
+class EntityCache:
+    """
+    Read-through cache of serialized entities keyed by (model, id).
+
+    Lookups go to the in-process LRU first and then to the shared backend.
+    Writes invalidate both; entries in other workers' LRUs expire after ``local_ttl``,
+    which bounds how long a worker can serve a stale entity.
+
+    Invalidation leaves a tombstone instead of deleting the key, and entries are only set
+    into empty keys, so a read which started before the write can not put its stale row
+    back; for ``tombstone_ttl`` seconds the key is served from the database only.
+    """
+
+    def __init__(
+            self,
+            max_size: int,
+            ttl: float,
+            local_ttl: float,
+            backend: Optional[CacheBackend] = None,
+            tombstone_ttl: float = 10) -> None:
+        self.local = LRUCache(max_size, local_ttl)
+        self.backend = backend
+        self.ttl = ttl
+        self.tombstone_ttl = tombstone_ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model, entity_id: int) -> str:
+        return f'{model.__tablename__}:{entity_id}'
+
+    async def get(self, model, entity_id: int) -> Optional[dict]:
+        key = self.key(model, entity_id)
+        value = self.local.get(key)
+        if value is None and self.backend is not None:
+            raw = await self.backend.get(key)
+            if raw is not None and raw != TOMBSTONE:
+                value = json.loads(raw)
+                self.local.add(key, value)
+        if value is None or value == TOMBSTONE:
+            value = None
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, model, entity_id: int, value: dict, shared: bool = True) -> None:
+        """:param shared: also store in the shared backend, not done for possibly lagging replica reads"""
+        key = self.key(model, entity_id)
+        self.local.add(key, value)
+        if shared and self.backend is not None:
+            await self.backend.add(key, json.dumps(value), self.ttl)
+
+    async def invalidate(self, model, entity_id: int) -> None:
+        key = self.key(model, entity_id)
+        self.local.set(key, TOMBSTONE)
+        if self.backend is not None:
+            await self.backend.set(key, TOMBSTONE, self.tombstone_ttl)
+
+    async def close(self) -> None:
+        if self.backend is not None:
+            await self.backend.close()
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.local.evictions,
+            'size': len(self.local),
+        }
+
+
+def create_entity_cache() -> EntityCache:
+    backend = None
+    if settings.cache.backend_url:
+        backend = RedisBackend(settings.cache.backend_url)
+    return EntityCache(
+        max_size=settings.cache.max_size,
+        ttl=settings.cache.ttl,
+        local_ttl=settings.cache.local_ttl,
+        backend=backend,
+        tombstone_ttl=settings.cache.tombstone_ttl,
+    )
+
+
+entity_cache = create_entity_cache()
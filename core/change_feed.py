@@ -0,0 +1,225 @@
+"""
+Live change feed: row changes published by database triggers with NOTIFY, see the
+change feed migration, and fanned out to WebSocket and server-sent event subscribers.
+
+Every worker keeps one dedicated LISTEN connection outside of the pool. Events are compact,
+``{"entity": "rooms", "op": "update", "id": 7, "campus_id": 1, "building_id": 3}``, clients
+fetch what they need through the ``get_*_by_ids`` endpoints. Whenever events may have been
+lost, after the listener reconnected or when a slow client's queue overflowed, the client
+gets ``{"op": "resync"}`` and should reload instead of applying events.
+
+Rows removed by a cascade after their parent can not be placed any more and arrive
+with null scope, the delete event of the parent itself is scoped.
+"""
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Optional
+
+import asyncpg
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.engine import make_url
+
+from core.database import database
+from core.metrics import CHANGE_FEED_EVENTS, CHANGE_FEED_SUBSCRIBERS
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'change_feed'
+RESYNC = json.dumps({'op': 'resync'})
+PING = json.dumps({'op': 'ping'})
+# seconds between attempts to reconnect the listener
+RECONNECT_DELAY = 1.0
+
+
+class FeedUnavailable(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, campus_id: Optional[int], building_id: Optional[int], queue_size: int) -> None:
+        self.campus_id = campus_id
+        self.building_id = building_id
+        self.queue: asyncio.Queue[str] = asyncio.Queue(queue_size)
+
+    def matches(self, event: dict) -> bool:
+        if self.campus_id is not None and event.get('campus_id') != self.campus_id:
+            return False
+        if self.building_id is not None and event.get('building_id') != self.building_id:
+            return False
+        return True
+
+    def put(self, payload: str) -> None:
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # the client fell behind, what it missed can only be recovered by reloading
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def events(self, heartbeat: float) -> AsyncIterator[str]:
+        """Event payloads as they arrive, PING after ``heartbeat`` seconds without any."""
+        while True:
+            try:
+                yield await asyncio.wait_for(self.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield PING
+
+
+class ChangeFeed:
+    """The LISTEN connection of this worker and its subscribers."""
+
+    def __init__(self, feed_settings) -> None:
+        self.settings = feed_settings
+        self.subscriptions: set[Subscription] = set()
+        self.task: Optional[asyncio.Task] = None
+        self.connected = False
+
+    def check_available(self) -> None:
+        if not self.connected:
+            raise FeedUnavailable('change feed is not connected')
+        if len(self.subscriptions) >= self.settings.max_subscribers:
+            raise FeedUnavailable(f'change feed has {len(self.subscriptions)} subscribers')
+
+    def subscribe(self, campus_id: Optional[int] = None, building_id: Optional[int] = None) -> Subscription:
+        self.check_available()
+        subscription = Subscription(campus_id, building_id, self.settings.queue_size)
+        self.subscriptions.add(subscription)
+        CHANGE_FEED_SUBSCRIBERS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+            CHANGE_FEED_SUBSCRIBERS.dec()
+
+    def dispatch(self, connection, pid, channel, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning('change feed payload is not JSON: %r', payload)
+            return
+        CHANGE_FEED_EVENTS.inc()
+        for subscription in self.subscriptions:
+            if subscription.matches(event):
+                subscription.put(payload)
+
+    async def start(self) -> None:
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def run(self) -> None:
+        # plain asyncpg, LISTEN needs a connection of its own for the lifetime of the worker
+        dsn = make_url(database.settings.url).set(drivername='postgresql').render_as_string(hide_password=False)
+        reconnected = False
+        while True:
+            lost = asyncio.Event()
+            try:
+                connection = await asyncpg.connect(dsn)
+            except (OSError, asyncpg.PostgresError):
+                logger.exception('change feed failed to connect')
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            try:
+                connection.add_termination_listener(lambda _: lost.set())
+                await connection.add_listener(CHANNEL, self.dispatch)
+                self.connected = True
+                if reconnected:
+                    # notifications sent while nobody listened are gone
+                    for subscription in self.subscriptions:
+                        subscription.put(RESYNC)
+                await lost.wait()
+                logger.warning('change feed connection lost')
+            except (OSError, asyncpg.PostgresError):
+                logger.exception('change feed listener failed')
+            finally:
+                self.connected = False
+                reconnected = True
+                if not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+
+change_feed = ChangeFeed(settings.change_feed)
+
+router = APIRouter(tags=['changes'])
+
+
+@router.websocket('/ws/changes')
+async def websocket_changes(
+        websocket: WebSocket,
+        campus_id: Optional[int] = Query(default=None),
+        building_id: Optional[int] = Query(default=None)):
+    await websocket.accept()
+    try:
+        subscription = change_feed.subscribe(campus_id, building_id)
+    except FeedUnavailable:
+        # 1013: try again later
+        await websocket.close(code=1013)
+        return
+    sender = asyncio.create_task(send_events(websocket, subscription))
+    # clients send nothing, receiving only notices the disconnect without waiting for a heartbeat
+    receiver = asyncio.create_task(receive_until_disconnect(websocket))
+    try:
+        await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (sender, receiver):
+            task.cancel()
+        await asyncio.gather(sender, receiver, return_exceptions=True)
+        change_feed.unsubscribe(subscription)
+
+
+async def send_events(websocket: WebSocket, subscription: Subscription) -> None:
+    try:
+        async for payload in subscription.events(change_feed.settings.heartbeat_seconds):
+            await websocket.send_text(payload)
+    except (WebSocketDisconnect, OSError):
+        pass
+
+
+async def receive_until_disconnect(websocket: WebSocket) -> None:
+    while (await websocket.receive())['type'] != 'websocket.disconnect':
+        pass
+
+
+@router.get('/changes/stream')
+async def stream_changes(campus_id: Optional[int] = None, building_id: Optional[int] = None):
+    """The same feed as /ws/changes as server-sent events."""
+    try:
+        change_feed.check_available()
+    except FeedUnavailable:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Change feed is not available, retry later',
+            headers={'Retry-After': '5'},
+        )
+
+    async def stream() -> AsyncIterator[str]:
+        # subscribed by the generator itself, a client gone before the first event never leaks a subscription
+        try:
+            subscription = change_feed.subscribe(campus_id, building_id)
+        except FeedUnavailable:
+            return
+        try:
+            async for payload in subscription.events(change_feed.settings.heartbeat_seconds):
+                yield f'data: {payload}\n\n'
+        finally:
+            change_feed.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type='text/event-stream',
+        # nginx must pass every event on right away
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
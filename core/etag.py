@@ -0,0 +1,76 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response, status
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def version_of(entity) -> str:
+    """Version of a single row, changes on every write thanks to ``updated_at``'s onupdate."""
+    return f'{entity.id}:{entity.updated_at.isoformat() if entity.updated_at else ""}'
+
+
+def collection_version_query(*queries: Select) -> Select:
+    versions = []
+    for query in queries:
+        rows = query.subquery()
+        versions.append(
+            select(func.concat_ws(':', func.count(), func.max(rows.c.updated_at), func.sum(rows.c.id)))
+            .select_from(rows)
+            .scalar_subquery()
+        )
+    return select(*versions)
+
+
+async def collection_version(db: AsyncSession, *queries: Select) -> str:
+    """
+    Version of one or more row sets in a single round trip.
+
+    Every query must select ``id`` and ``updated_at`` columns; a set is described by its
+    row count, max(updated_at) and sum(id) so that updates, inserts and deletes all change it.
+    """
+    result = await db.execute(collection_version_query(*queries))
+    return '|'.join(str(version) for version in result.one())
+
+
+class ConditionalRequest:
+    """
+    Dependency for conditional GETs: sets the ``ETag`` header on the response
+    and answers ``304 Not Modified`` when it matches ``If-None-Match``.
+    """
+
+    def __init__(self, request: Request, response: Response) -> None:
+        self.request = request
+        self.response = response
+
+    def etag(self, version: str) -> str:
+        return make_etag(self.request.url.path, self.request.url.query, version)
+
+    def matches(self, etag: str) -> bool:
+        if_none_match = self.request.headers.get('if-none-match')
+        if not if_none_match:
+            return False
+        # weak comparison, see RFC 9110 section 8.8.3.2
+        candidates = {candidate.strip().removeprefix('W/') for candidate in if_none_match.split(',')}
+        return '*' in candidates or etag.removeprefix('W/') in candidates
+
+    def not_modified(self, version: str) -> Optional[Response]:
+        """Returns a 304 response when the client copy is current, otherwise tags the 200 response."""
+        etag = self.etag(version)
+        if self.matches(etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        self.response.headers['ETag'] = etag
+        return None
+
+    def tag(self, response: Response) -> Response:
+        """Copies the ETag onto a response returned directly, FastAPI only adds headers to responses it builds."""
+        etag = self.response.headers.get('etag')
+        if etag is not None:
+            response.headers['ETag'] = etag
+        return response
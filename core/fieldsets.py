@@ -0,0 +1,88 @@
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence
+
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel as Schema
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.loader import id_in
+from core.projection import Projection
+
+
+@dataclass(frozen=True)
+class FieldSet:
+    # schema fields to serialize, in schema order and always with id
+    fields: tuple[str, ...]
+    includes: tuple[str, ...] = ()
+
+
+def parse_names(value: Optional[str], allowed: Sequence[str], parameter: str) -> list[str]:
+    names = list(dict.fromkeys(name.strip() for name in (value or '').split(',') if name.strip()))
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Unknown {parameter}: {", ".join(unknown)}. Allowed: {", ".join(allowed)}'
+        )
+    return names
+
+
+def fieldset_dependency(schema: type[Schema], includes: Sequence[str]):
+    """Route dependency parsing ``?fields=id,name&include=room_items`` against ``schema`` and ``includes``."""
+    schema_fields = list(schema.model_fields)
+
+    def dependency(
+            fields: Optional[str] = Query(None, description=f'Comma separated subset of: {", ".join(schema_fields)}'),
+            include: Optional[str] = Query(
+                None, description=f'Comma separated related data: {", ".join(includes) or "none"}'
+            )) -> FieldSet:
+        requested = set(parse_names(fields, schema_fields, 'fields')) or set(schema_fields)
+        # id is needed for cursors and to attach included rows
+        requested.add('id')
+        return FieldSet(
+            fields=tuple(name for name in schema_fields if name in requested),
+            includes=tuple(parse_names(include, includes, 'include')),
+        )
+
+    return dependency
+
+
+class Include:
+    """
+    Related rows of a relationship, loaded for a whole page of parents with one
+    ``WHERE key = ANY(:keys)`` query, the column-only counterpart of selectinload.
+    """
+
+    def __init__(self, relationship, schema: type[Schema]) -> None:
+        prop = relationship.property
+        (local, remote), = prop.local_remote_pairs
+        self.name = prop.key
+        self.many = prop.uselist
+        # column of the parent holding the key and column of the related table matching it
+        self.local = local
+        self.remote = remote
+        self.projection = Projection(prop.mapper.class_, schema)
+
+    async def load(self, db: AsyncSession, keys: Sequence[int]) -> dict[int, Any]:
+        keys = list({key for key in keys if key is not None})
+        if not keys:
+            return {}
+        result = await db.execute(
+            select(*self.projection.columns, self.remote.label('include_key'))
+            .filter(id_in(self.remote, keys))
+            .order_by(self.projection.model.id)
+        )
+        rows = result.all()
+        dumped = self.projection.dump(rows)
+        if not self.many:
+            return {row.include_key: item for row, item in zip(rows, dumped)}
+        related = {}
+        for row, item in zip(rows, dumped):
+            related.setdefault(row.include_key, []).append(item)
+        return related
+
+    def version_query(self, keys: Select) -> Select:
+        """The related rows of the parents whose ``local`` keys ``keys`` selects, for ETags."""
+        model = self.projection.model
+        return select(model.id, model.updated_at).filter(self.remote.in_(keys))
@@ -0,0 +1,100 @@
+import asyncio
+from typing import Any, Optional
+
+from fastapi import HTTPException, Query, status
+from sqlalchemy import Integer, any_, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload
+
+MAX_BATCH_IDS = 500
+
+
+def batch_ids(ids: str = Query(..., description=f'Comma separated ids, at most {MAX_BATCH_IDS}')) -> list[int]:
+    """Parses ``?ids=1,2,3`` into unique ids, keeping the requested order."""
+    try:
+        values = [int(value) for value in ids.split(',') if value.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='ids must be comma separated integers'
+        )
+    if not values:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='No ids given'
+        )
+    if len(values) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'At most {MAX_BATCH_IDS} ids are allowed'
+        )
+    return list(dict.fromkeys(values))
+
+
+def id_in(column, ids: list[int]):
+    """``column = ANY(:ids)``, a single array parameter, so the statement text does not depend on len(ids)."""
+    return column == any_(literal(list(ids), ARRAY(Integer)))
+
+
+class BatchLoader:
+    """
+    DataLoader-style lookups by id of one model within one session.
+
+    Every ``load`` issued in the same event loop tick, e.g. by coroutines run with
+    ``asyncio.gather``, is answered by one ``WHERE id = ANY(:ids)`` query. Results are
+    memoized for the lifetime of the session, missing ids resolve to None.
+    """
+
+    def __init__(self, db: AsyncSession, model) -> None:
+        self.db = db
+        self.model = model
+        self.loaded: dict[int, Any] = {}
+        self.pending: dict[int, asyncio.Future] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    async def load(self, entity_id: int):
+        if entity_id in self.loaded:
+            return self.loaded[entity_id]
+        future = self.pending.get(entity_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self.pending[entity_id] = loop.create_future()
+            if self.task is None:
+                # runs after every coroutine which is ready in this tick had the chance to add its id
+                self.task = loop.create_task(self.dispatch())
+        return await future
+
+    async def load_many(self, ids: list[int]) -> list:
+        return list(await asyncio.gather(*(self.load(entity_id) for entity_id in ids)))
+
+    async def dispatch(self) -> None:
+        pending, self.pending, self.task = self.pending, {}, None
+        try:
+            # one session can not run two statements at once, loaders of other models wait here
+            async with session_lock(self.db):
+                result = await self.db.execute(
+                    select(self.model).options(raiseload('*')).filter(id_in(self.model.id, list(pending)))
+                )
+                found = {entity.id: entity for entity in result.scalars().all()}
+        except Exception as error:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for entity_id, future in pending.items():
+            self.loaded[entity_id] = found.get(entity_id)
+            if not future.done():
+                future.set_result(self.loaded[entity_id])
+
+
+def session_lock(db: AsyncSession) -> asyncio.Lock:
+    return db.info.setdefault('batch_loader_lock', asyncio.Lock())
+
+
+def loader(db: AsyncSession, model) -> BatchLoader:
+    """The batch loader of ``model`` bound to ``db``, created on first use."""
+    loaders = db.info.setdefault('batch_loaders', {})
+    if model not in loaders:
+        loaders[model] = BatchLoader(db, model)
+    return loaders[model]
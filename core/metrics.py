@@ -0,0 +1,217 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator
+
+from fastapi import APIRouter, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# With several uvicorn workers every process writes its samples to PROMETHEUS_MULTIPROC_DIR
+# and /metrics merges them, so whichever worker answers the scrape reports the totals.
+MULTIPROCESS = 'PROMETHEUS_MULTIPROC_DIR' in os.environ
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency',
+    ['method', 'route'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS = Counter(
+    'http_requests_total',
+    'HTTP requests by status code',
+    ['method', 'route', 'status'],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'http_requests_in_progress',
+    'HTTP requests being processed',
+    multiprocess_mode='livesum',
+)
+DB_QUERIES = Histogram(
+    'db_queries_per_request',
+    'SQL statements issued per HTTP request',
+    ['route'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+DB_TIME = Histogram(
+    'db_time_per_request_seconds',
+    'Time spent executing SQL per HTTP request',
+    ['route'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+DB_ROWS = Histogram(
+    'db_rows_per_request',
+    'Rows returned or affected by SQL per HTTP request',
+    ['route'],
+    buckets=(0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 100000),
+)
+WRITE_BEHIND_DEPTH = Gauge(
+    'write_behind_buffer_depth',
+    'Rows accepted but not yet flushed to the database',
+    ['buffer'],
+    multiprocess_mode='livesum',
+)
+WRITE_BEHIND_FLUSH = Histogram(
+    'write_behind_flush_seconds',
+    'Duration of one write-behind flush',
+    ['buffer'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+WRITE_BEHIND_ROWS = Counter(
+    'write_behind_rows_total',
+    'Write-behind rows by outcome: flushed, skipped by the flush, spooled to disk or replayed from disk',
+    ['buffer', 'outcome'],
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    'admission_in_flight',
+    'Requests holding an admission slot',
+    ['group'],
+    multiprocess_mode='livesum',
+)
+ADMISSION_QUEUED = Gauge(
+    'admission_queued',
+    'Requests waiting for an admission slot',
+    ['group'],
+    multiprocess_mode='livesum',
+)
+ADMISSION_WAIT = Histogram(
+    'admission_wait_seconds',
+    'Time admitted requests waited for a slot',
+    ['group'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+ADMISSION_REJECTED = Counter(
+    'admission_rejected_total',
+    'Requests rejected with 503 because the queue was full or the wait timed out',
+    ['group', 'reason'],
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out',
+    'Pool connections in use',
+    ['engine'],
+    multiprocess_mode='livesum',
+)
+DB_POOL_OVERFLOW = Gauge(
+    'db_pool_overflow',
+    'Pool connections open beyond the pool size',
+    ['engine'],
+    multiprocess_mode='livesum',
+)
+CHANGE_FEED_SUBSCRIBERS = Gauge(
+    'change_feed_subscribers',
+    'Open WebSocket and server-sent event change feed subscriptions',
+    multiprocess_mode='livesum',
+)
+CHANGE_FEED_EVENTS = Counter(
+    'change_feed_events_total',
+    'Change notifications received by the LISTEN connection',
+)
+
+# scrapes and long-lived streams, whose duration says nothing about latency
+EXCLUDED_PATHS = {'/metrics', '/changes/stream'}
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+    rows: int = 0
+
+
+# every active collector of the current request, the metrics middleware and query budgets nest
+active_query_stats: ContextVar[tuple[QueryStats, ...]] = ContextVar('active_query_stats', default=())
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started_at = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    collectors = active_query_stats.get()
+    if not collectors:
+        return
+    elapsed = time.perf_counter() - context._query_started_at
+    rows = max(cursor.rowcount, 0)
+    for stats in collectors:
+        stats.count += 1
+        stats.seconds += elapsed
+        stats.rows += rows
+
+
+@contextmanager
+def collect_queries() -> Iterator[QueryStats]:
+    """Collects every statement issued through an instrumented engine inside the block."""
+    stats = QueryStats()
+    token = active_query_stats.set(active_query_stats.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        active_query_stats.reset(token)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    event.listen(engine.sync_engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine.sync_engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """Records latency, status and SQL usage of every request under its route template."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] in EXCLUDED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            with collect_queries() as stats:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            REQUESTS_IN_PROGRESS.dec()
+            # the router stores the matched route in the scope, unmatched paths share one label
+            route = scope.get('route')
+            route_path = getattr(route, 'path', 'unmatched')
+            method = scope['method']
+            REQUEST_LATENCY.labels(method, route_path).observe(elapsed)
+            REQUESTS.labels(method, route_path, str(status_code)).inc()
+            DB_QUERIES.labels(route_path).observe(stats.count)
+            DB_TIME.labels(route_path).observe(stats.seconds)
+            DB_ROWS.labels(route_path).observe(stats.rows)
+
+
+router = APIRouter(tags=['monitoring'])
+
+
+@router.get('/metrics', include_in_schema=False)
+async def get_metrics():
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,26 @@
+from fastapi import APIRouter
+
+from core.admission import admission_gates
+from core.cache import entity_cache
+from core.database import database, pool_status
+
+router = APIRouter(prefix='/monitoring', tags=['monitoring'])
+
+
+@router.get('/pool')
+async def get_pool_status():
+    max_overflow = {
+        'primary': database.settings.max_overflow,
+        'replica': database.settings.replica_max_overflow,
+    }
+    return {name: pool_status(engine, max_overflow[name]) for name, engine in database.engines().items()}
+
+
+@router.get('/admission')
+async def get_admission_status():
+    return {name: gate.stats() for name, gate in admission_gates.items()}
+
+
+@router.get('/cache')
+async def get_cache_status():
+    return entity_cache.stats()
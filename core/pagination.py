@@ -0,0 +1,73 @@
+import base64
+import binascii
+from typing import Generic, List, Optional, TypeVar
+
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+T = TypeVar('T')
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+class PageParams:
+    def __init__(
+            self,
+            limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+            after: Optional[str] = Query(None, description='Opaque cursor taken from next_cursor'),
+            legacy: bool = Query(False, description='Return the whole table as a plain list (deprecated)'),
+    ) -> None:
+        self.limit = limit
+        self.after = after
+        self.legacy = legacy
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Invalid cursor'
+        )
+
+
+def page_window(query: Select, id_column, params: PageParams) -> Select:
+    """The rows of one page plus one lookahead row used to detect the next page."""
+    if params.legacy:
+        return query.order_by(id_column)
+    if params.after is not None:
+        query = query.filter(id_column > decode_cursor(params.after))
+    return query.order_by(id_column).limit(params.limit + 1)
+
+
+async def paginate(db: AsyncSession, query: Select, id_column, params: PageParams, rows: bool = False):
+    """
+    Keyset pagination on ``id_column``: every page is an index range scan
+    starting right after the last seen id, so deep pages cost the same as the first.
+
+    :param rows: return Row tuples of a column query instead of the first column of each row
+    """
+    result = await db.execute(page_window(query, id_column, params))
+    items = list(result.all() if rows else result.scalars().all())
+    if params.legacy:
+        return items
+
+    next_cursor = None
+    if len(items) > params.limit:
+        items = items[:params.limit]
+        next_cursor = encode_cursor(items[-1].id)
+    return {'items': items, 'next_cursor': next_cursor}
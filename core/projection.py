@@ -0,0 +1,46 @@
+from typing import List, Sequence
+
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel as Schema, TypeAdapter, create_model
+from sqlalchemy import Row, Select, select
+
+
+class Projection:
+    """
+    Column-only read path of one Get* schema.
+
+    Selects exactly the schema fields as plain Row tuples (no ORM instances, identity map
+    or relationship loading), validates them with a TypeAdapter built once at import time
+    and serializes with orjson.
+    """
+
+    def __init__(self, model, schema: type[Schema]) -> None:
+        self.model = model
+        self.schema = schema
+        self.columns = tuple(getattr(model, name) for name in schema.model_fields)
+        self.adapter = TypeAdapter(List[schema])
+        self.narrowed: dict[tuple[str, ...], Projection] = {}
+
+    def narrow(self, fields: Sequence[str]) -> 'Projection':
+        """Projection of a subset of the schema fields, built once per subset."""
+        fields = tuple(fields)
+        if fields == tuple(self.schema.model_fields):
+            return self
+        projection = self.narrowed.get(fields)
+        if projection is None:
+            schema = create_model(
+                f'{self.schema.__name__}Fields',
+                **{name: (self.schema.model_fields[name].annotation, self.schema.model_fields[name]) for name in fields},
+            )
+            projection = self.narrowed[fields] = Projection(self.model, schema)
+        return projection
+
+    def select(self) -> Select:
+        return select(*self.columns)
+
+    def dump(self, rows: Sequence[Row]) -> list[dict]:
+        """Validated rows as dicts of python values, orjson encodes dates and enums natively."""
+        return self.adapter.dump_python(self.adapter.validate_python(rows, from_attributes=True))
+
+    def response(self, rows: Sequence[Row]) -> ORJSONResponse:
+        return ORJSONResponse(self.dump(rows))
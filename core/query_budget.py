@@ -0,0 +1,61 @@
+import logging
+from contextlib import contextmanager
+from typing import AsyncGenerator, Iterator
+
+from fastapi import Depends, Request
+
+from core.metrics import QueryStats, collect_queries
+import settings
+settings = settings.settings
+
+logger = logging.getLogger(__name__)
+
+# raise instead of logging when a budget is exceeded, switched on by the pytest plugin in core/testing.py
+strict = settings.query_budget_strict
+
+
+class QueryBudgetExceeded(Exception):
+    def __init__(self, name: str, budget: int, stats: QueryStats) -> None:
+        super().__init__(f'{name} issued {stats.count} SQL statements, budget is {budget}')
+        self.name = name
+        self.budget = budget
+        self.stats = stats
+
+
+def check_budget(name: str, budget: int, stats: QueryStats) -> None:
+    if stats.count <= budget:
+        return
+    if strict:
+        raise QueryBudgetExceeded(name, budget, stats)
+    logger.warning('%s issued %s SQL statements, budget is %s', name, stats.count, budget)
+
+
+@contextmanager
+def count_queries(name: str = 'block', budget: int | None = None) -> Iterator[QueryStats]:
+    """
+    Counts statements issued through the engine inside the block and
+    checks them against ``budget`` when one is given::
+
+        with count_queries('seed', budget=3) as stats:
+            ...
+    """
+    with collect_queries() as stats:
+        yield stats
+    if budget is not None:
+        check_budget(name, budget, stats)
+
+
+def query_budget(budget: int):
+    """
+    Route dependency declaring how many SQL statements the route may issue::
+
+        @router.get('/...', dependencies=[query_budget(3)])
+    """
+    async def dependency(request: Request) -> AsyncGenerator[QueryStats, None]:
+        with collect_queries() as stats:
+            yield stats
+        route = request.scope.get('route')
+        check_budget(getattr(route, 'path', request.url.path), budget, stats)
+
+    dependency.budget = budget
+    return Depends(dependency)
@@ -0,0 +1,267 @@
+from collections import namedtuple
+from typing import Awaitable, Callable, Optional, Sequence
+
+from fastapi import HTTPException, status
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel as Schema
+from sqlalchemy import Row, Select, delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.cache import entity_cache
+from core.etag import collection_version, collection_version_query, version_of
+from core.fieldsets import FieldSet, Include, fieldset_dependency
+from core.loader import id_in
+from core.pagination import DEFAULT_LIMIT, PageParams, encode_cursor, page_window, paginate
+from core.projection import Projection
+
+
+# async (db, old rows, new rows) run in the write transaction right before the commit
+WriteHook = Callable[[AsyncSession, Sequence[Row], Sequence[Row]], Awaitable[None]]
+
+
+class CrudRepository:
+    """
+    Shared CRUD statements of one model.
+
+    Writes are single statements with RETURNING, so no extra SELECT or refresh
+    round trips are needed, and every write invalidates the entity cache.
+    """
+
+    def __init__(
+            self,
+            model,
+            schema: type[Schema],
+            not_found_detail: str,
+            options: Sequence = (),
+            invalidates: Sequence = (),
+            on_write: Optional[WriteHook] = None,
+            tracks: Sequence = (),
+            includes: Sequence[tuple] = ()) -> None:
+        """
+        :param schema: Get* schema stored in the entity cache
+        :param options: loader options applied to ORM reads
+        :param invalidates: one-to-many relationships along which a delete cascades or detaches rows, each
+            starting at this model or at the target of an earlier one, e.g. ``(Room.requests, Request.room_items)``
+        :param on_write: hook which keeps derived tables in step
+        :param tracks: columns ``on_write`` reads, updates run it only when one of them is written,
+            with their old values locked and read by the UPDATE itself
+        :param includes: (relationship, Get* schema) pairs list and batch endpoints can embed with ``?include=``
+        """
+        self.model = model
+        self.schema = schema
+        self.not_found_detail = not_found_detail
+        self.options = tuple(options)
+        self.invalidates = tuple(invalidates)
+        self.on_write = on_write
+        self.tracks = tuple(tracks)
+        # old values of the tracked columns as the hook sees them
+        self.old_row = namedtuple(f'Old{model.__name__}', ['id', *(column.key for column in self.tracks)])
+        self.columns = tuple(model.__table__.columns)
+        self.projection = Projection(model, schema)
+        self.includes = {include.name: include for include in (Include(*pair) for pair in includes)}
+        # route dependency parsing ?fields= and ?include=
+        self.fieldset = fieldset_dependency(schema, list(self.includes))
+
+    def not_found(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=self.not_found_detail
+        )
+
+    def select(self):
+        return select(self.model).options(*self.options)
+
+    async def get(self, db: AsyncSession, entity_id: int):
+        result = await db.execute(self.select().filter(self.model.id == entity_id))
+        entity = result.scalars().first()
+        if entity is None:
+            raise self.not_found()
+        return entity
+
+    async def get_cached(self, db: AsyncSession, entity_id: int) -> dict:
+        """
+        :return: {"version": row version used for ETags, "data": serialized schema}
+        """
+        cached = await entity_cache.get(self.model, entity_id)
+        if cached is None:
+            entity = await self.get(db, entity_id)
+            cached = {
+                'version': version_of(entity),
+                'data': self.schema.model_validate(entity).model_dump(mode='json'),
+            }
+            # a replica read may predate the write which invalidated the entry, keep it in the short-lived LRU only
+            await entity_cache.set(self.model, entity_id, cached, shared=not db.info.get('replica'))
+        return cached
+
+    def fieldset_select(self, fieldset: Optional[FieldSet]) -> tuple[Projection, Select]:
+        """The projection of the requested fields and a select of them plus the keys the includes need."""
+        if fieldset is None:
+            return self.projection, self.projection.select()
+        projection = self.projection.narrow(fieldset.fields)
+        keys = [
+            self.includes[name].local for name in fieldset.includes
+            if self.includes[name].local.key not in fieldset.fields
+        ]
+        return projection, select(*projection.columns, *dict.fromkeys(keys))
+
+    async def dump(self, db: AsyncSession, projection: Projection, rows: Sequence[Row], fieldset: Optional[FieldSet]) -> list[dict]:
+        """Serialized rows with every requested include attached, one query per include."""
+        items = projection.dump(rows)
+        for name in fieldset.includes if fieldset is not None else ():
+            include = self.includes[name]
+            related = await include.load(db, [getattr(row, include.local.key) for row in rows])
+            empty = [] if include.many else None
+            for row, item in zip(rows, items):
+                item[name] = related.get(getattr(row, include.local.key), empty)
+        return items
+
+    async def page(self, db: AsyncSession, params: PageParams, fieldset: Optional[FieldSet] = None) -> ORJSONResponse:
+        """One page of ``schema`` through the projection fast path, as a ready response."""
+        projection, query = self.fieldset_select(fieldset)
+        page = await paginate(db, query, self.model.id, params, rows=True)
+        if params.legacy:
+            return ORJSONResponse(await self.dump(db, projection, page, fieldset))
+        return ORJSONResponse({
+            'items': await self.dump(db, projection, page['items'], fieldset),
+            'next_cursor': page['next_cursor'],
+        })
+
+    async def get_many(self, db: AsyncSession, ids: list[int], fieldset: Optional[FieldSet] = None) -> ORJSONResponse:
+        """Rows of ``ids`` in the requested order from one ``id = ANY(:ids)`` query, missing ids are skipped."""
+        projection, query = self.fieldset_select(fieldset)
+        result = await db.execute(query.filter(id_in(self.model.id, ids)))
+        rows = {row.id: row for row in result.all()}
+        found = [rows[entity_id] for entity_id in ids if entity_id in rows]
+        return ORJSONResponse(await self.dump(db, projection, found, fieldset))
+
+    def include_version_queries(self, parents: Select, fieldset: Optional[FieldSet]) -> list[Select]:
+        """Version queries of the included rows of the parent rows ``parents`` selects."""
+        if fieldset is None or not fieldset.includes:
+            return []
+        includes = [self.includes[name] for name in fieldset.includes]
+        selected = {column.key for column in parents.selected_columns}
+        keys = dict.fromkeys(include.local for include in includes if include.local.key not in selected)
+        window = parents.add_columns(*keys).subquery()
+        return [include.version_query(select(window.c[include.local.key])) for include in includes]
+
+    async def get_many_version(self, db: AsyncSession, ids: list[int], fieldset: Optional[FieldSet] = None) -> str:
+        parents = select(self.model.id, self.model.updated_at).filter(id_in(self.model.id, ids))
+        return await collection_version(db, parents, *self.include_version_queries(parents, fieldset))
+
+    def page_version_query(self, params: PageParams):
+        return page_window(select(self.model.id, self.model.updated_at), self.model.id, params)
+
+    async def page_version(self, db: AsyncSession, params: PageParams, fieldset: Optional[FieldSet] = None) -> str:
+        parents = self.page_version_query(params)
+        return await collection_version(db, parents, *self.include_version_queries(parents, fieldset))
+
+    def hot_statements(self) -> list:
+        """The by-id, page and page version statements, in the exact shape the endpoints issue them."""
+        statements = [self.select().filter(self.model.id == 0)]
+        for params in (
+                PageParams(limit=DEFAULT_LIMIT, after=None, legacy=False),
+                PageParams(limit=DEFAULT_LIMIT, after=encode_cursor(0), legacy=False)):
+            statements.append(page_window(self.projection.select(), self.model.id, params))
+            statements.append(collection_version_query(self.page_version_query(params)))
+        return statements
+
+    async def create(self, db: AsyncSession, data: dict) -> Row:
+        result = await db.execute(insert(self.model).values(**data).returning(*self.columns))
+        row = result.one()
+        if self.on_write is not None:
+            await self.on_write(db, [], [row])
+        await db.commit()
+        return row
+
+    async def update(self, db: AsyncSession, entity_id: int, data: dict) -> Row:
+        """``UPDATE ... WHERE id = :id RETURNING *``, a missing row is a 404."""
+        if not data:
+            result = await db.execute(select(*self.columns).filter(self.model.id == entity_id))
+            row = result.first()
+            if row is None:
+                raise self.not_found()
+            return row
+
+        if self.on_write is None or not any(column.key in data for column in self.tracks):
+            result = await db.execute(
+                update(self.model)
+                .where(self.model.id == entity_id)
+                .values(**data)
+                .returning(*self.columns)
+                .execution_options(synchronize_session=False)
+            )
+            row = result.first()
+            if row is None:
+                raise self.not_found()
+        else:
+            row, old = await self.update_tracked(db, entity_id, data)
+            await self.on_write(db, [old], [row])
+        await db.commit()
+        await entity_cache.invalidate(self.model, entity_id)
+        return row
+
+    async def update_tracked(self, db: AsyncSession, entity_id: int, data: dict) -> tuple[Row, tuple]:
+        """
+        ``UPDATE t SET ... FROM (SELECT ... FOR UPDATE) old ... RETURNING old.*, t.*``, the
+        row and its old tracked values from one statement.
+        """
+        old = (
+            select(self.model.id, *self.tracks)
+            .filter(self.model.id == entity_id)
+            .with_for_update()
+            .subquery('old')
+        )
+        result = await db.execute(
+            update(self.model)
+            .where(self.model.id == old.c.id)
+            .values(**data)
+            .returning(*self.columns, *(old.c[column.key].label(f'old_{column.key}') for column in self.tracks))
+            .execution_options(synchronize_session=False)
+        )
+        row = result.first()
+        if row is None:
+            raise self.not_found()
+        return row, self.old_row(row.id, *(getattr(row, f'old_{column.key}') for column in self.tracks))
+
+    async def delete(self, db: AsyncSession, entity_id: int) -> None:
+        """
+        ``DELETE ... RETURNING *``, children are removed by the ON DELETE rules of the foreign keys
+        and only the ids of the rows along ``invalidates`` leave the entity cache.
+        """
+        # RETURNING also collects the ids of the rows the foreign keys will cascade to, the cascade
+        # runs after the statement, so their ids are read before they are gone or detached
+        descendants = self.descendant_ids(entity_id)
+        result = await db.execute(
+            delete(self.model)
+            .where(self.model.id == entity_id)
+            .returning(*self.columns, *(
+                ids.with_only_columns(func.array_agg(model.id)).scalar_subquery().label(f'descendants_{index}')
+                for index, (model, ids) in enumerate(descendants)
+            ))
+            .execution_options(synchronize_session=False)
+        )
+        row = result.first()
+        if row is None:
+            raise self.not_found()
+        if self.on_write is not None:
+            await self.on_write(db, [row], [])
+        await db.commit()
+        await entity_cache.invalidate(self.model, entity_id)
+        for index, (model, _) in enumerate(descendants):
+            for descendant_id in getattr(row, f'descendants_{index}') or ():
+                await entity_cache.invalidate(model, descendant_id)
+
+    def descendant_ids(self, entity_id: int) -> list[tuple[type, Select]]:
+        """(model, select of ids) of the rows each of ``invalidates`` reaches from the row ``entity_id``."""
+        reached = {self.model: None}
+        selects = []
+        for relationship in self.invalidates:
+            (_, foreign_key), = relationship.property.local_remote_pairs
+            parent_ids = reached[relationship.parent.class_]
+            model = relationship.property.mapper.class_
+            ids = select(model.id).filter(
+                foreign_key == entity_id if parent_ids is None else foreign_key.in_(parent_ids)
+            )
+            reached.setdefault(model, ids)
+            selects.append((model, ids))
+        return selects
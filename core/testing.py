@@ -0,0 +1,19 @@
+"""
+Pytest plugin, enable it with ``pytest_plugins = ['core.testing']`` in a conftest.
+
+Query budgets declared on routes raise ``QueryBudgetExceeded`` while it is active.
+"""
+import pytest
+
+from core import query_budget
+
+
+def pytest_configure(config):
+    query_budget.strict = True
+
+
+@pytest.fixture
+def query_counter():
+    """Counts the statements issued inside the test, ``query_counter.count`` holds the total."""
+    with query_budget.count_queries('test') as stats:
+        yield stats
@@ -0,0 +1,190 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from core.metrics import WRITE_BEHIND_DEPTH, WRITE_BEHIND_FLUSH, WRITE_BEHIND_ROWS
+
+logger = logging.getLogger(__name__)
+
+# inserts a batch and returns how many rows were actually inserted, must ignore ids which already exist
+FlushRows = Callable[[list[dict]], Awaitable[int]]
+# returns ``count`` fresh ids of the target table
+ReserveIds = Callable[[int], Awaitable[list[int]]]
+
+# seconds between looks into the spool directory
+SPOOL_REPLAY_INTERVAL = 5.0
+
+
+class BufferFull(Exception):
+    pass
+
+
+class WriteBehindBuffer:
+    """
+    Acknowledges rows right away and inserts them later in batches from one background task,
+    every ``flush_interval`` seconds or as soon as ``max_rows`` rows are waiting.
+
+    Rows get their final id at submit time from blocks reserved with ``reserve_ids``, so the
+    acknowledged id is the id the row ends up with. Batches which fail to insert are written
+    to a spool file and replayed later, possibly more than once, hence ``flush`` has to skip
+    ids which already exist. A clean shutdown flushes or spools everything; rows still in
+    memory when the process is killed are lost.
+
+    The lock and the event are created by ``start``, inside the loop which runs the buffer,
+    so a buffer built at import time works under every loop that starts it. Rows are only
+    accepted between ``start`` and ``stop``.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            flush: FlushRows,
+            reserve_ids: ReserveIds,
+            flush_interval: float,
+            max_rows: int,
+            max_buffer: int,
+            spool_dir: Path) -> None:
+        self.name = name
+        self.flush = flush
+        self.reserve_ids = reserve_ids
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.max_buffer = max_buffer
+        self.spool_dir = spool_dir
+        self.rows: list[dict] = []
+        # reserved ids, reversed so that pop() hands them out in ascending order
+        self.ids: list[int] = []
+        self.ids_lock: asyncio.Lock | None = None
+        self.wake: asyncio.Event | None = None
+        self.task: asyncio.Task | None = None
+        self.stopping = False
+        self.next_replay = 0.0
+
+    @property
+    def depth(self) -> int:
+        return len(self.rows)
+
+    async def submit(self, row: dict) -> dict:
+        """Queues ``row`` and returns it with its id. Raises BufferFull when ``max_buffer`` rows are waiting."""
+        if self.task is None:
+            raise RuntimeError(f'{self.name} write-behind buffer is not started')
+        if len(self.rows) >= self.max_buffer:
+            raise BufferFull(f'{self.name} write-behind buffer holds {len(self.rows)} rows')
+        row = {**row, 'id': await self.next_id()}
+        self.rows.append(row)
+        WRITE_BEHIND_DEPTH.labels(self.name).inc()
+        if len(self.rows) >= self.max_rows:
+            self.wake.set()
+        return row
+
+    async def next_id(self) -> int:
+        async with self.ids_lock:
+            if not self.ids:
+                self.ids = sorted(await self.reserve_ids(self.max_rows), reverse=True)
+            return self.ids.pop()
+
+    async def start(self) -> None:
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.release_stale_claims()
+        self.ids_lock = asyncio.Lock()
+        self.wake = asyncio.Event()
+        self.stopping = False
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stops the flush loop after its current iteration and flushes, or spools, the rest."""
+        if self.task is None:
+            return
+        self.stopping = True
+        self.wake.set()
+        await self.task
+        self.task = None
+        await self.flush_buffered()
+
+    async def run(self) -> None:
+        while not self.stopping:
+            try:
+                await asyncio.wait_for(self.wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+            try:
+                flushed = await self.flush_buffered()
+                if flushed and time.monotonic() >= self.next_replay:
+                    self.next_replay = time.monotonic() + SPOOL_REPLAY_INTERVAL
+                    await self.replay_spool()
+            except Exception:
+                logger.exception('%s write-behind flush loop failed', self.name)
+
+    async def flush_buffered(self) -> bool:
+        """Flushes everything buffered in batches of ``max_rows``, returns False when a batch had to be spooled."""
+        flushed = True
+        while self.rows:
+            batch, self.rows = self.rows[:self.max_rows], self.rows[self.max_rows:]
+            try:
+                if not await self.flush_batch(batch):
+                    # the database is failing, do not hammer it with the rest of the buffer
+                    self.write_spool(batch + self.rows)
+                    batch, self.rows = batch + self.rows, []
+                    flushed = False
+            finally:
+                WRITE_BEHIND_DEPTH.labels(self.name).dec(len(batch))
+        return flushed
+
+    async def flush_batch(self, batch: list[dict]) -> bool:
+        start = time.perf_counter()
+        try:
+            inserted = await self.flush(batch)
+        except Exception:
+            logger.exception('%s write-behind flush of %s rows failed', self.name, len(batch))
+            return False
+        finally:
+            WRITE_BEHIND_FLUSH.labels(self.name).observe(time.perf_counter() - start)
+        WRITE_BEHIND_ROWS.labels(self.name, 'flushed').inc(inserted)
+        WRITE_BEHIND_ROWS.labels(self.name, 'skipped').inc(len(batch) - inserted)
+        return True
+
+    def write_spool(self, rows: list[dict]) -> None:
+        """Writes ``rows`` to a new spool file, renamed into place only after fsync."""
+        path = self.spool_dir / f'{self.name}-{os.getpid()}-{time.time_ns()}.jsonl'
+        partial = path.with_suffix('.partial')
+        with open(partial, 'w') as spool:
+            spool.writelines(json.dumps(row, default=str) + '\n' for row in rows)
+            spool.flush()
+            os.fsync(spool.fileno())
+        os.replace(partial, path)
+        WRITE_BEHIND_ROWS.labels(self.name, 'spooled').inc(len(rows))
+        logger.warning('%s write-behind spooled %s rows to %s', self.name, len(rows), path)
+
+    async def replay_spool(self) -> None:
+        for path in sorted(self.spool_dir.glob(f'{self.name}-*.jsonl')):
+            # claiming by rename keeps workers sharing the directory from replaying the same file at once
+            claimed = path.with_suffix(f'.replaying-{os.getpid()}')
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+            with open(claimed) as spool:
+                rows = [json.loads(line) for line in spool if line.strip()]
+            for start in range(0, len(rows), self.max_rows):
+                if not await self.flush_batch(rows[start:start + self.max_rows]):
+                    self.write_spool(rows[start:])
+                    os.remove(claimed)
+                    return
+            os.remove(claimed)
+            WRITE_BEHIND_ROWS.labels(self.name, 'replayed').inc(len(rows))
+
+    def release_stale_claims(self) -> None:
+        """Returns files claimed by workers which died during a replay to the spool."""
+        for claimed in self.spool_dir.glob(f'{self.name}-*.replaying-*'):
+            pid = int(claimed.suffix.rsplit('-', 1)[-1])
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                os.rename(claimed, claimed.with_suffix('.jsonl'))
+            except PermissionError:
+                pass
@@ -35,6 +35,12 @@ while True:
 END
 
 
+# metrics of previous worker processes must not leak into the new ones
+if [ -n "${PROMETHEUS_MULTIPROC_DIR:-}" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 # ./manage.sh migrate "something";
 alembic upgrade head;
 
@@ -1,16 +1,65 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from core.admission import AdmissionMiddleware
+from core.cache import entity_cache
+from core.change_feed import change_feed
+from core.change_feed import router as change_feed_router
+from core.database import database
+from core.metrics import MetricsMiddleware
+from core.metrics import router as metrics_router
+from core.monitoring import router as monitoring_router
+from compus.request_buffer import request_buffer
+from compus.views import hot_statements
 from compus.views import router as campus_router
 from compus.views import router_for_building as router_for_building
 from compus.views import router_for_room as router_for_room
 from compus.views import router_for_room_item as router_for_room_item
 from compus.views import router_for_request as router_for_request
 from compus.views import router_logic_query as router_logic_query
+from compus.views import router_search as router_search
+from settings import settings
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # connect and prepare before the first request instead of during it
+    await database.warm_up(settings.database.warm_up_connections, hot_statements())
+    if settings.write_behind.enabled:
+        await request_buffer.start()
+    if settings.change_feed.enabled:
+        await change_feed.start()
+    yield
+    await change_feed.stop()
+    if settings.write_behind.enabled:
+        # before dispose, the final flush still needs the pool
+        await request_buffer.stop()
+    await entity_cache.close()
+    await database.dispose()
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(lifespan=lifespan)
+    if settings.admission.enabled:
+        app.add_middleware(
+            AdmissionMiddleware,
+            admission_settings=settings.admission,
+            pool_capacity=settings.database.pool_size + settings.database.max_overflow,
+        )
+    # added last, so it is the outermost and also sees the requests admission rejects
+    app.add_middleware(MetricsMiddleware)
+
+    app.include_router(campus_router)
+    app.include_router(router_for_building)
+    app.include_router(router_for_room)
+    app.include_router(router_for_room_item)
+    app.include_router(router_for_request)
+    app.include_router(router_logic_query)
+    app.include_router(router_search)
+    app.include_router(change_feed_router)
+    app.include_router(monitoring_router)
+    app.include_router(metrics_router)
+    return app
 
-app = FastAPI()
 
-app.include_router(campus_router)
-app.include_router(router_for_building)
-app.include_router(router_for_room)
-app.include_router(router_for_room_item)
-app.include_router(router_for_request)
-app.include_router(router_logic_query)
\ No newline at end of file
+app = create_app()
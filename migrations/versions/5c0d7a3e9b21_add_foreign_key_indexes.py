@@ -0,0 +1,52 @@
+"""add foreign key indexes
+
+Revision ID: 5c0d7a3e9b21
+Revises: 1e298972220f
+Create Date: 2025-10-02 11:24:07.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c0d7a3e9b21'
+down_revision: Union[str, Sequence[str], None] = '1e298972220f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('ix_buildings_campus_id', 'buildings', ['campus_id']),
+    ('ix_rooms_building_id_floor', 'rooms', ['building_id', 'floor']),
+    ('ix_room_items_room_id', 'room_items', ['room_id']),
+    ('ix_room_items_request_id', 'room_items', ['request_id']),
+    ('ix_requests_room_id', 'requests', ['room_id']),
+    ('ix_requests_user_id', 'requests', ['user_id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY can not run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, columns,
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,61 @@
+"""foreign keys on delete rules
+
+Revision ID: 8f41b6d2c7e3
+Revises: 5c0d7a3e9b21
+Create Date: 2025-10-06 15:02:41.907126
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f41b6d2c7e3'
+down_revision: Union[str, Sequence[str], None] = '5c0d7a3e9b21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (table, column, referred table, on delete)
+FOREIGN_KEYS = [
+    ('buildings', 'campus_id', 'campuses', 'CASCADE'),
+    ('rooms', 'building_id', 'buildings', 'CASCADE'),
+    ('requests', 'room_id', 'rooms', 'CASCADE'),
+    ('room_items', 'room_id', 'rooms', 'CASCADE'),
+    ('room_items', 'request_id', 'requests', 'SET NULL'),
+]
+
+
+def replace_foreign_key(table: str, column: str, referred_table: str, on_delete: str | None) -> None:
+    # swap the constraint in one ALTER without checking existing rows, see validate_foreign_keys
+    name = f'{table}_{column}_fkey'
+    rule = f' ON DELETE {on_delete}' if on_delete else ''
+    op.execute(
+        f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name}, '
+        f'ADD CONSTRAINT {name} FOREIGN KEY ({column}) REFERENCES {referred_table} (id){rule} NOT VALID'
+    )
+
+
+def validate_foreign_keys() -> None:
+    # the ALTERs above hold ACCESS EXCLUSIVE locks until their transaction commits. autocommit_block
+    # commits it first, then every VALIDATE runs in its own transaction and only takes
+    # SHARE UPDATE EXCLUSIVE, so writes go on while existing rows are checked
+    with op.get_context().autocommit_block():
+        for table, column, _, _ in FOREIGN_KEYS:
+            op.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {table}_{column}_fkey')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, column, referred_table, on_delete in FOREIGN_KEYS:
+        replace_foreign_key(table, column, referred_table, on_delete)
+    validate_foreign_keys()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, column, referred_table, _ in reversed(FOREIGN_KEYS):
+        replace_foreign_key(table, column, referred_table, None)
+    validate_foreign_keys()
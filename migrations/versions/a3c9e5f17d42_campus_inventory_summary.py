@@ -0,0 +1,66 @@
+"""campus inventory summary
+
+Revision ID: a3c9e5f17d42
+Revises: 8f41b6d2c7e3
+Create Date: 2025-10-14 10:37:52.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c9e5f17d42'
+down_revision: Union[str, Sequence[str], None] = '8f41b6d2c7e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('campus_inventory_summary',
+    sa.Column('campus_id', sa.Integer(), nullable=False),
+    sa.Column('tip', postgresql.ENUM('dorm', 'lab', 'sport', 'library', name='buildingtip', create_type=False), nullable=True),
+    sa.Column('room_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('item_quantity', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('open_request_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['campus_id'], ['campuses.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint(
+        'campus_id', 'tip',
+        name='uq_campus_inventory_summary_campus_id_tip',
+        postgresql_nulls_not_distinct=True,
+    )
+    )
+    # initial totals, afterwards the write handlers keep them up to date
+    op.execute("""
+        INSERT INTO campus_inventory_summary (campus_id, tip, room_count, item_quantity, open_request_count)
+        SELECT b.campus_id, b.tip,
+               coalesce(sum(r.rooms), 0), coalesce(sum(i.quantity), 0), coalesce(sum(q.requests), 0)
+        FROM buildings b
+        LEFT JOIN (SELECT building_id, count(*) AS rooms FROM rooms GROUP BY building_id) r
+            ON r.building_id = b.id
+        LEFT JOIN (
+            SELECT rooms.building_id, sum(room_items.quantity) AS quantity
+            FROM rooms JOIN room_items ON room_items.room_id = rooms.id
+            GROUP BY rooms.building_id
+        ) i ON i.building_id = b.id
+        LEFT JOIN (
+            SELECT rooms.building_id, count(*) AS requests
+            FROM rooms JOIN requests ON requests.room_id = rooms.id
+            GROUP BY rooms.building_id
+        ) q ON q.building_id = b.id
+        WHERE b.campus_id IS NOT NULL
+        GROUP BY b.campus_id, b.tip
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('campus_inventory_summary')
@@ -0,0 +1,52 @@
+"""name trigram indexes
+
+Revision ID: c71d2e8a4f90
+Revises: a3c9e5f17d42
+Create Date: 2025-10-16 09:12:40.551873
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c71d2e8a4f90'
+down_revision: Union[str, Sequence[str], None] = 'a3c9e5f17d42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('ix_rooms_name_trgm_gist', 'rooms'),
+    ('ix_room_items_name_trgm_gist', 'room_items'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # gist, unlike gin, also answers ORDER BY name <->> :text LIMIT nearest first
+    # CREATE INDEX CONCURRENTLY can not run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, table in INDEXES:
+            op.create_index(
+                name, table, ['name'],
+                unique=False,
+                postgresql_using='gist',
+                postgresql_ops={'name': 'gist_trgm_ops'},
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,91 @@
+"""change feed triggers
+
+Revision ID: d4b8e1f63a27
+Revises: c71d2e8a4f90
+Create Date: 2025-10-18 11:05:13.290417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4b8e1f63a27'
+down_revision: Union[str, Sequence[str], None] = 'c71d2e8a4f90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+CHANNEL = 'change_feed'
+
+# table: (columns taken from the changed rows, joins resolving the scope, campus_id, building_id)
+TABLES = {
+    'campuses': ('id', '', 'r.id', 'NULL::integer'),
+    'buildings': ('id, campus_id', '', 'r.campus_id', 'r.id'),
+    'rooms': (
+        'id, building_id',
+        'LEFT JOIN buildings b ON b.id = r.building_id',
+        'b.campus_id', 'r.building_id',
+    ),
+    'room_items': (
+        'id, room_id',
+        'LEFT JOIN rooms rm ON rm.id = r.room_id LEFT JOIN buildings b ON b.id = rm.building_id',
+        'b.campus_id', 'rm.building_id',
+    ),
+    'requests': (
+        'id, room_id',
+        'LEFT JOIN rooms rm ON rm.id = r.room_id LEFT JOIN buildings b ON b.id = rm.building_id',
+        'b.campus_id', 'rm.building_id',
+    ),
+}
+OPERATIONS = {
+    'insert': ('NEW TABLE AS new_rows', 'SELECT {columns} FROM new_rows'),
+    'update': (
+        'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+        # a moved row is announced to the subscribers of its old and of its new scope
+        'SELECT {columns} FROM old_rows UNION SELECT {columns} FROM new_rows',
+    ),
+    'delete': ('OLD TABLE AS old_rows', 'SELECT {columns} FROM old_rows'),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, (columns, joins, campus_id, building_id) in TABLES.items():
+        # statement level triggers with transition tables, so bulk writes resolve their scopes in one query
+        for operation, (referencing, rows) in OPERATIONS.items():
+            op.execute(f"""
+                CREATE FUNCTION change_feed_{table}_{operation}() RETURNS trigger
+                LANGUAGE plpgsql AS $$
+                BEGIN
+                    -- bulk loads such as tools.seed switch the feed off for their session
+                    IF current_setting('change_feed.disabled', true) = 'on' THEN
+                        RETURN NULL;
+                    END IF;
+                    PERFORM pg_notify('{CHANNEL}', json_build_object(
+                        'entity', '{table}',
+                        'op', '{operation}',
+                        'id', r.id,
+                        'campus_id', {campus_id},
+                        'building_id', {building_id}
+                    )::text)
+                    FROM ({rows.format(columns=columns)}) r {joins};
+                    RETURN NULL;
+                END
+                $$
+            """)
+            op.execute(f"""
+                CREATE TRIGGER change_feed_{operation} AFTER {operation.upper()} ON {table}
+                REFERENCING {referencing}
+                FOR EACH STATEMENT EXECUTE FUNCTION change_feed_{table}_{operation}()
+            """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in reversed(TABLES):
+        for operation in OPERATIONS:
+            op.execute(f'DROP TRIGGER IF EXISTS change_feed_{operation} ON {table}')
+            op.execute(f'DROP FUNCTION IF EXISTS change_feed_{table}_{operation}()')
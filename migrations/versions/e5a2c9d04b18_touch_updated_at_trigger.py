@@ -0,0 +1,48 @@
+"""touch updated_at trigger
+
+Revision ID: e5a2c9d04b18
+Revises: d4b8e1f63a27
+Create Date: 2025-10-20 09:41:27.118532
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a2c9d04b18'
+down_revision: Union[str, Sequence[str], None] = 'd4b8e1f63a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLES = ['campuses', 'buildings', 'rooms', 'room_items', 'requests']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # updates made by the database itself, such as ON DELETE SET NULL on room_items.request_id,
+    # bypass the ORM onupdate and would leave ETag versions unchanged
+    op.execute("""
+        CREATE FUNCTION touch_updated_at() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.updated_at = now();
+            RETURN NEW;
+        END
+        $$
+    """)
+    for table in TABLES:
+        op.execute(
+            f'CREATE TRIGGER touch_updated_at BEFORE UPDATE ON {table} '
+            f'FOR EACH ROW EXECUTE FUNCTION touch_updated_at()'
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in reversed(TABLES):
+        op.execute(f'DROP TRIGGER IF EXISTS touch_updated_at ON {table}')
+    op.execute('DROP FUNCTION IF EXISTS touch_updated_at()')
@@ -1,9 +1,10 @@
 import pathlib
 from os import getenv
 from dotenv import load_dotenv
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
-assert load_dotenv(), '.env not found'
+# a missing .env is fine, the variables may come from the environment itself
+load_dotenv()
 
 
 @dataclass
@@ -13,12 +14,90 @@ class DatabaseSettings:
     host: str
     port: str
     name: str
+    pool_size: int = 10
+    max_overflow: int = 10
+    # seconds to wait for a free connection before failing
+    pool_timeout: float = 30
+    # seconds after which a connection is replaced
+    pool_recycle: int = 1800
+    pre_ping: bool = True
+    prepared_statement_cache_size: int = 100
+    # server side statement_timeout in milliseconds, 0 disables it
+    statement_timeout: int = 30000
+    # optional streaming replica used by GET handlers, with its own pool
+    replica_url: str | None = None
+    replica_pool_size: int = 10
+    replica_max_overflow: int = 10
+    # seconds a client reads from the primary after a write, should exceed the replica lag
+    read_your_writes_seconds: int = 5
+    # pool connections opened and primed at startup, per engine
+    warm_up_connections: int = 5
 
     @property
     def url(self) -> str:
         return f"postgresql+asyncpg://{self.user}:{self.password}@{self.host}:{self.port}/{self.name}"
 
 
+@dataclass
+class CacheSettings:
+    max_size: int
+    ttl: float
+    local_ttl: float
+    backend_url: str | None = None
+    # seconds an invalidated key refuses sets from reads which may have started before the write
+    tombstone_ttl: float = 10
+
+
+@dataclass
+class WriteBehindSettings:
+    # /request/submit_request queues requests instead of inserting them when enabled
+    enabled: bool = False
+    flush_interval_ms: int = 50
+    # rows per INSERT, a flush starts early once this many are waiting
+    max_rows: int = 500
+    # submissions are rejected with 503 above this many waiting rows
+    max_buffer: int = 20000
+    # batches which failed to insert are kept here until they can be replayed
+    spool_dir: str = 'spool'
+
+
+@dataclass
+class ChangeFeedSettings:
+    # LISTEN connection of every worker, /ws/changes and /changes/stream answer 503 without it
+    enabled: bool = True
+    # events buffered per subscriber, a subscriber which falls further behind gets a resync event
+    queue_size: int = 1000
+    # seconds without events after which a ping is sent
+    heartbeat_seconds: float = 15
+    max_subscribers: int = 1000
+
+
+@dataclass
+class RouteGroupLimit:
+    # requests of the group running at once
+    concurrency: int
+    # requests of the group waiting for a slot, more are rejected with 503 right away
+    queue: int
+
+
+@dataclass
+class AdmissionSettings:
+    enabled: bool = True
+    # milliseconds a queued request waits for a slot before it is rejected
+    queue_timeout_ms: int = 2000
+    # seconds sent in the Retry-After header of rejections
+    retry_after: int = 1
+    # limits by route group, see core.admission.route_group
+    groups: dict[str, RouteGroupLimit] = field(default_factory=dict)
+
+
+def route_group_limit(group: str, concurrency: int, queue: int) -> RouteGroupLimit:
+    return RouteGroupLimit(
+        concurrency=int(getenv(f'ADMISSION_{group.upper()}_CONCURRENCY', str(concurrency))),
+        queue=int(getenv(f'ADMISSION_{group.upper()}_QUEUE', str(queue))),
+    )
+
+
 class AuthSettings:
     def __init__(
             self,
@@ -34,10 +113,10 @@ class AuthSettings:
         :param refresh_token_life_time: float Lifetime in hours
         """
         self.secret_key: str = secret_key or getenv('SECRET_KEY')
-        self.access_token_life_time: float = access_token_life_time or float(getenv('ACCESS_TOKEN_LIFETIME'))
-        self.refresh_token_life_time: float = refresh_token_life_time or float(getenv('REFRESH_TOKEN_LIFETIME'))
-        self.algorithm: str = algorithm or getenv('ALGORITHM')
-        self.max_enter_attempts: int = max_enter_attempts or int(getenv('MAX_ENTER_ATTEMPTS'))
+        self.access_token_life_time: float = access_token_life_time or float(getenv('ACCESS_TOKEN_LIFETIME', '100'))
+        self.refresh_token_life_time: float = refresh_token_life_time or float(getenv('REFRESH_TOKEN_LIFETIME', '10000'))
+        self.algorithm: str = algorithm or getenv('ALGORITHM', 'HS256')
+        self.max_enter_attempts: int = max_enter_attempts or int(getenv('MAX_ENTER_ATTEMPTS', '3'))
 
 
 
@@ -50,20 +129,70 @@ class Settings:
     protocol: str
     database: DatabaseSettings
     auth: AuthSettings
+    cache: CacheSettings
+    query_budget_strict: bool
+    write_behind: WriteBehindSettings
+    admission: AdmissionSettings
+    change_feed: ChangeFeedSettings
 
 
 settings = Settings(
     base_dir=pathlib.Path(__file__).parent.absolute(),
-    host=getenv('DOMAIN'),
-    port=int(getenv('PORT')),
-    protocol=getenv('PROTOCOL'),
+    host=getenv('DOMAIN', 'localhost'),
+    port=int(getenv('PORT', '8000')),
+    protocol=getenv('PROTOCOL', 'http'),
     database=DatabaseSettings(
         user=getenv('POSTGRES_USER'),
         password=getenv('POSTGRES_PASSWORD'),
-        host=getenv('DATABASE_HOST'),
-        port=getenv('DATABASE_PORT'),
+        host=getenv('DATABASE_HOST', 'localhost'),
+        port=getenv('DATABASE_PORT', '5432'),
         name=getenv('POSTGRES_DB'),
+        pool_size=int(getenv('DATABASE_POOL_SIZE', '10')),
+        max_overflow=int(getenv('DATABASE_MAX_OVERFLOW', '10')),
+        pool_timeout=float(getenv('DATABASE_POOL_TIMEOUT', '30')),
+        pool_recycle=int(getenv('DATABASE_POOL_RECYCLE', '1800')),
+        pre_ping=getenv('DATABASE_PRE_PING', 'true').lower() == 'true',
+        prepared_statement_cache_size=int(getenv('DATABASE_STATEMENT_CACHE_SIZE', '100')),
+        statement_timeout=int(getenv('DATABASE_STATEMENT_TIMEOUT', '30000')),
+        replica_url=getenv('DATABASE_REPLICA_URL') or None,
+        replica_pool_size=int(getenv('DATABASE_REPLICA_POOL_SIZE', '10')),
+        replica_max_overflow=int(getenv('DATABASE_REPLICA_MAX_OVERFLOW', '10')),
+        read_your_writes_seconds=int(getenv('DATABASE_READ_YOUR_WRITES_SECONDS', '5')),
+        warm_up_connections=int(getenv('DATABASE_WARM_UP_CONNECTIONS', '5')),
+    ),
+    auth=AuthSettings(),
+    cache=CacheSettings(
+        max_size=int(getenv('CACHE_MAX_SIZE', '10000')),
+        ttl=float(getenv('CACHE_TTL', '300')),
+        local_ttl=float(getenv('CACHE_LOCAL_TTL', '5')),
+        backend_url=getenv('CACHE_BACKEND_URL'),
+        tombstone_ttl=float(getenv('CACHE_TOMBSTONE_TTL', '10')),
+    ),
+    query_budget_strict=getenv('QUERY_BUDGET_STRICT', 'false').lower() == 'true',
+    write_behind=WriteBehindSettings(
+        enabled=getenv('WRITE_BEHIND_ENABLED', 'false').lower() == 'true',
+        flush_interval_ms=int(getenv('WRITE_BEHIND_FLUSH_INTERVAL_MS', '50')),
+        max_rows=int(getenv('WRITE_BEHIND_MAX_ROWS', '500')),
+        max_buffer=int(getenv('WRITE_BEHIND_MAX_BUFFER', '20000')),
+        spool_dir=getenv('WRITE_BEHIND_SPOOL_DIR', 'spool'),
+    ),
+    admission=AdmissionSettings(
+        enabled=getenv('ADMISSION_ENABLED', 'true').lower() == 'true',
+        queue_timeout_ms=int(getenv('ADMISSION_QUEUE_TIMEOUT_MS', '2000')),
+        retry_after=int(getenv('ADMISSION_RETRY_AFTER', '1')),
+        groups={
+            # adds up to the default pool size plus overflow
+            'lookup': route_group_limit('lookup', concurrency=7, queue=200),
+            'list': route_group_limit('list', concurrency=4, queue=50),
+            'logic': route_group_limit('logic', concurrency=3, queue=20),
+            'write': route_group_limit('write', concurrency=4, queue=100),
+            'export': route_group_limit('export', concurrency=2, queue=10),
+        },
+    ),
+    change_feed=ChangeFeedSettings(
+        enabled=getenv('CHANGE_FEED_ENABLED', 'true').lower() == 'true',
+        queue_size=int(getenv('CHANGE_FEED_QUEUE_SIZE', '1000')),
+        heartbeat_seconds=float(getenv('CHANGE_FEED_HEARTBEAT_SECONDS', '15')),
+        max_subscribers=int(getenv('CHANGE_FEED_MAX_SUBSCRIBERS', '1000')),
     ),
-    auth=AuthSettings()
 )
-print(settings.database.url)
@@ -0,0 +1,128 @@
+"""
+The tests run the application against a real Postgres: the server of the DATABASE_* and
+POSTGRES_* settings, but the database named by TEST_POSTGRES_DB, ``<POSTGRES_DB>_test`` by
+default, which is created when missing and migrated to head. Tests needing it are skipped
+when the server can not be reached.
+"""
+import asyncio
+import pathlib
+from datetime import date
+from os import environ, getenv
+
+from dotenv import load_dotenv
+
+# before anything imports settings, which reads the environment once
+load_dotenv()
+environ['POSTGRES_DB'] = getenv('TEST_POSTGRES_DB') or f"{getenv('POSTGRES_DB')}_test"
+# the LISTEN connection of the feed has no route and no budget
+environ['CHANGE_FEED_ENABLED'] = 'false'
+
+import asyncpg
+import pytest
+from alembic import command
+from alembic.config import Config
+from fastapi.testclient import TestClient
+
+from core.metrics import collect_queries
+from settings import settings
+
+pytest_plugins = ['core.testing']
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+
+async def create_database() -> None:
+    database_settings = settings.database
+    connection = await asyncpg.connect(
+        user=database_settings.user,
+        password=database_settings.password,
+        host=database_settings.host,
+        port=database_settings.port,
+        database='postgres',
+    )
+    try:
+        exists = await connection.fetchval('SELECT 1 FROM pg_database WHERE datname = $1', database_settings.name)
+        if not exists:
+            await connection.execute(f'CREATE DATABASE "{database_settings.name}"')
+    finally:
+        await connection.close()
+
+
+@pytest.fixture(scope='session')
+def migrated_database():
+    try:
+        asyncio.run(create_database())
+    except (OSError, asyncpg.PostgresError) as error:
+        pytest.skip(f'test database is not available: {error}')
+    command.upgrade(Config(str(ROOT / 'alembic.ini')), 'head')
+
+
+class QueryRecorder:
+    """ASGI wrapper keeping the statement stats of the last request in ``stats``."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self.stats = None
+
+    async def __call__(self, scope, receive, send):
+        with collect_queries() as stats:
+            if scope['type'] == 'http':
+                self.stats = stats
+            await self.app(scope, receive, send)
+
+
+@pytest.fixture(scope='session')
+def recorder(migrated_database):
+    from main import create_app
+
+    return QueryRecorder(create_app())
+
+
+@pytest.fixture(scope='session')
+def client(recorder):
+    with TestClient(recorder) as client:
+        yield client
+
+
+async def insert_rows() -> dict:
+    from compus.models import BuildingTip
+    from compus.views import (
+        building_repository,
+        campus_repository,
+        request_repository,
+        room_item_repository,
+        room_repository,
+    )
+    from core.database import database
+
+    # through the repositories, so the on_write hooks keep the inventory summary in step
+    async with database.session_maker() as session:
+        campus = await campus_repository.create(session, {'name': 'Test campus', 'address': 'Test street 1'})
+        building = await building_repository.create(
+            session, {'campus_id': campus.id, 'tip': BuildingTip.lab, 'floors': 3}
+        )
+        room = await room_repository.create(session, {'building_id': building.id, 'name': 'Room 101', 'floor': 1})
+        request = await request_repository.create(session, {'room_id': room.id, 'user_id': 1})
+        room_item = await room_item_repository.create(session, {
+            'request_id': request.id,
+            'room_id': room.id,
+            'name': 'Item chair',
+            'quantity': 2,
+            'data': date.today(),
+            'status': True,
+        })
+    return {
+        'campus_id': campus.id,
+        # /campus/get_campus_by_id names its parameter so
+        'about_us_id': campus.id,
+        'building_id': building.id,
+        'room_id': room.id,
+        'request_id': request.id,
+        'room_item_id': room_item.id,
+    }
+
+
+@pytest.fixture
+def rows(client) -> dict:
+    """Ids of a fresh campus with one building, room, request and room item, by path parameter name."""
+    return client.portal.call(insert_rows)
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+
+import pytest
+
+from core.admission import AdmissionGate, AdmissionMiddleware, Rejected, route_group
+from settings import AdmissionSettings, RouteGroupLimit, settings
+
+
+@pytest.mark.parametrize('method, path, group', [
+    ('GET', '/room/get_rooms', 'list'),
+    ('GET', '/room/get_room_by_id/1', 'lookup'),
+    ('GET', '/room/get_rooms_by_ids', 'lookup'),
+    ('GET', '/logic_query/get_room/1', 'logic'),
+    ('GET', '/room_item/export_room_items', 'export'),
+    ('POST', '/room/create_room', 'write'),
+    ('DELETE', '/logic_query/whatever', 'write'),
+    ('GET', '/metrics', None),
+    ('GET', '/changes/stream', None),
+])
+def test_route_group(method, path, group):
+    assert route_group(method, path) == group
+
+
+def test_gate_queues_then_rejects():
+    async def scenario():
+        gate = AdmissionGate('test', concurrency=1, queue=1, timeout=0.05)
+        await gate.acquire()
+        assert gate.in_flight == 1
+
+        # the queued request times out while the slot is held
+        with pytest.raises(Rejected) as timeout:
+            await gate.acquire()
+        assert timeout.value.reason == 'timeout'
+
+        waiter = asyncio.create_task(gate.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as full:
+            await gate.acquire()
+        assert full.value.reason == 'queue_full'
+
+        gate.release()
+        await waiter
+        assert gate.stats() == {'concurrency': 1, 'in_flight': 1, 'queue': 1, 'waiting': 0}
+        gate.release()
+        assert gate.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_middleware_answers_503_with_retry_after():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await release.wait()
+            await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        middleware = AdmissionMiddleware(app, AdmissionSettings(
+            queue_timeout_ms=10, retry_after=3, groups={'list': RouteGroupLimit(concurrency=1, queue=0)},
+        ))
+
+        async def call() -> list[dict]:
+            messages = []
+
+            async def send(message):
+                messages.append(message)
+
+            scope = {'type': 'http', 'method': 'GET', 'path': '/room/get_rooms', 'headers': []}
+            await middleware(scope, None, send)
+            return messages
+
+        first = asyncio.create_task(call())
+        await asyncio.sleep(0)
+        rejected = await call()
+        release.set()
+        admitted = await first
+        return admitted[0], rejected[0]
+
+    admitted, rejected = asyncio.run(scenario())
+    assert admitted['status'] == 200
+    assert rejected['status'] == 503
+    assert (b'retry-after', b'3') in rejected['headers']
+
+
+def test_default_limits_fit_the_default_pool():
+    admitted = sum(limit.concurrency for limit in settings.admission.groups.values())
+    assert admitted <= settings.database.pool_size + settings.database.max_overflow
+
+
+def test_limits_over_the_pool_are_reported(caplog):
+    limits = AdmissionSettings(groups={'list': RouteGroupLimit(8, 0), 'write': RouteGroupLimit(8, 0)})
+    with caplog.at_level(logging.WARNING, logger='core.admission'):
+        AdmissionMiddleware(None, limits, pool_capacity=20)
+        assert not caplog.records
+        AdmissionMiddleware(None, limits, pool_capacity=15)
+    assert 'pool holds 15 connections' in caplog.text
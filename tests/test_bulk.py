@@ -0,0 +1,57 @@
+import pytest
+from fastapi import HTTPException
+
+from core.bulk import MAX_BULK_SIZE, check_bulk_size, raise_bulk_errors
+
+
+def test_empty_batch_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        check_bulk_size([])
+    assert error.value.status_code == 400
+
+
+def test_oversized_batch_is_rejected():
+    check_bulk_size([{}] * MAX_BULK_SIZE)
+    with pytest.raises(HTTPException) as error:
+        check_bulk_size([{}] * (MAX_BULK_SIZE + 1))
+    assert error.value.status_code == 413
+
+
+def test_errors_are_reported_by_index():
+    with pytest.raises(HTTPException) as error:
+        raise_bulk_errors([{'index': 3, 'detail': 'b'}, {'index': 1, 'detail': 'a'}])
+    assert error.value.status_code == 400
+    assert [item['index'] for item in error.value.detail] == [1, 3]
+
+
+def test_bulk_create_keeps_payload_order(client, rows):
+    names = [f'Room 3{index:02}' for index in range(5)]
+    response = client.post('/room/create_rooms', json=[
+        {'building_id': rows['building_id'], 'name': name, 'floor': 1} for name in names
+    ])
+    assert response.status_code == 200
+    assert [room['name'] for room in response.json()] == names
+
+
+def test_bulk_create_names_every_bad_row_and_inserts_nothing(client, rows):
+    before = client.get(f'/logic_query/get_building_summary/{rows["building_id"]}').json()['total_rooms']
+    response = client.post('/room/create_rooms', json=[
+        {'building_id': rows['building_id'], 'name': 'Room 401', 'floor': 1},
+        {'building_id': 0, 'name': 'Room 402', 'floor': 1},
+        {'building_id': rows['building_id'], 'name': 'Room 403', 'floor': 99},
+    ])
+
+    assert response.status_code == 400
+    assert response.json()['detail'] == [
+        {'index': 1, 'detail': 'Building not found'},
+        {'index': 2, 'detail': 'This building has no floor like this'},
+    ]
+    after = client.get(f'/logic_query/get_building_summary/{rows["building_id"]}').json()['total_rooms']
+    assert after == before
+
+
+def test_oversized_bulk_create_answers_413(client, rows):
+    response = client.post('/request/create_requests', json=[
+        {'user_id': 1, 'room_id': rows['room_id']}
+    ] * (MAX_BULK_SIZE + 1))
+    assert response.status_code == 413
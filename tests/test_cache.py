@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+from compus.models import Request, Room, RoomItems
+from core.cache import TOMBSTONE, EntityCache, LocalBackend, LRUCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_size=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.evictions == 1
+
+
+def test_lru_entries_expire(monkeypatch):
+    cache = LRUCache(max_size=10, ttl=5)
+    cache.set('a', 1)
+    now = time.monotonic()
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 6)
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_entity_cache_reads_through_the_shared_backend():
+    async def scenario():
+        backend = LocalBackend()
+        writer = EntityCache(max_size=10, ttl=60, local_ttl=5, backend=backend)
+        reader = EntityCache(max_size=10, ttl=60, local_ttl=5, backend=backend)
+        await writer.set(Room, 1, {'version': '1', 'data': {}})
+        assert await reader.get(Room, 1) == {'version': '1', 'data': {}}
+
+        await writer.invalidate(Room, 1)
+        assert await writer.get(Room, 1) is None
+        # the reader keeps its local copy until local_ttl, the shared entry is gone
+        assert await reader.backend.get(EntityCache.key(Room, 1)) == TOMBSTONE
+        assert writer.stats()['misses'] == 1
+
+    asyncio.run(scenario())
+
+
+def test_reads_from_before_an_invalidation_are_not_cached():
+    async def scenario():
+        backend = LocalBackend()
+        writer = EntityCache(max_size=10, ttl=60, local_ttl=5, backend=backend, tombstone_ttl=10)
+        reader = EntityCache(max_size=10, ttl=60, local_ttl=5, backend=backend, tombstone_ttl=10)
+        # the reader missed and loaded the old row, then the write invalidated before the reader set it
+        assert await reader.get(Room, 1) is None
+        await writer.invalidate(Room, 1)
+        await reader.set(Room, 1, {'version': 'old', 'data': {}})
+        await writer.set(Room, 1, {'version': 'old', 'data': {}})
+
+        assert await backend.get(EntityCache.key(Room, 1)) == TOMBSTONE
+        assert await writer.get(Room, 1) is None
+        assert await EntityCache(max_size=10, ttl=60, local_ttl=5, backend=backend).get(Room, 1) is None
+
+    asyncio.run(scenario())
+
+
+def test_entries_are_cached_again_after_the_tombstone(monkeypatch):
+    async def scenario():
+        cache = EntityCache(max_size=10, ttl=60, local_ttl=5, backend=LocalBackend(), tombstone_ttl=10)
+        await cache.invalidate(Room, 1)
+        now = time.monotonic()
+        monkeypatch.setattr(time, 'monotonic', lambda: now + 11)
+        await cache.set(Room, 1, {'version': 'new', 'data': {}})
+        assert await cache.backend.get(EntityCache.key(Room, 1)) is not None
+        assert await cache.get(Room, 1) == {'version': 'new', 'data': {}}
+
+    asyncio.run(scenario())
+
+
+def test_replica_reads_stay_out_of_the_shared_backend():
+    async def scenario():
+        cache = EntityCache(max_size=10, ttl=60, local_ttl=5, backend=LocalBackend())
+        await cache.set(Room, 1, {'version': '1', 'data': {}}, shared=False)
+        assert await cache.backend.get(EntityCache.key(Room, 1)) is None
+        assert await cache.get(Room, 1) is not None
+
+    asyncio.run(scenario())
+
+
+def test_deletes_find_the_rows_their_cascade_reaches():
+    from compus.views import room_repository
+
+    descendants = room_repository.descendant_ids(1)
+    assert [model for model, _ in descendants] == [RoomItems, Request, RoomItems]
+    # items of the room's requests may sit in other rooms, they are found through the requests
+    assert 'room_items.request_id IN (SELECT requests.id' in str(descendants[2][1])
+
+
+def test_by_id_reads_see_updates(client, rows):
+    path = f'/room/get_room_by_id/{rows["room_id"]}'
+    assert client.get(path).json()['name'] == 'Room 101'
+
+    client.patch(f'/room/update_room/{rows["room_id"]}', json={'name': 'Room 105'})
+
+    assert client.get(path).json()['name'] == 'Room 105'
+
+
+def test_cascaded_children_leave_the_cache(client, rows):
+    item_path = f'/room_item/get_room_item_by_id/{rows["room_item_id"]}'
+    assert client.get(item_path).json()['request_id'] == rows['request_id']
+
+    client.delete(f'/request/delete_request/{rows["request_id"]}')
+    assert client.get(item_path).json()['request_id'] is None
+
+    client.delete(f'/room/delete_room/{rows["room_id"]}')
+    assert client.get(item_path).status_code == 404
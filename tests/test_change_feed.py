@@ -0,0 +1,98 @@
+import asyncio
+import json
+
+import asyncpg
+import pytest
+from sqlalchemy.engine import make_url
+
+from core.change_feed import CHANNEL, PING, RESYNC, ChangeFeed, FeedUnavailable, Subscription
+from settings import ChangeFeedSettings
+
+
+def event(**scope) -> str:
+    return json.dumps({'entity': 'rooms', 'op': 'update', 'id': 1, **scope})
+
+
+def test_subscription_scope():
+    assert Subscription(None, None, 10).matches({'campus_id': 1, 'building_id': 2})
+    assert Subscription(1, None, 10).matches({'campus_id': 1, 'building_id': 2})
+    assert not Subscription(2, None, 10).matches({'campus_id': 1, 'building_id': 2})
+    assert not Subscription(None, 3, 10).matches({'campus_id': 1, 'building_id': 2})
+    # rows removed by a cascade arrive without scope
+    assert not Subscription(1, None, 10).matches({'campus_id': None, 'building_id': None})
+
+
+def test_overflow_replaces_the_queue_with_resync():
+    subscription = Subscription(None, None, 2)
+    for _ in range(3):
+        subscription.put(event())
+    assert subscription.queue.qsize() == 1
+    assert subscription.queue.get_nowait() == RESYNC
+
+
+def test_events_ping_when_idle():
+    async def scenario():
+        events = Subscription(None, None, 10).events(heartbeat=0.01)
+        return await events.__anext__()
+
+    assert asyncio.run(scenario()) == PING
+
+
+def test_dispatch_fans_out_by_scope():
+    feed = ChangeFeed(ChangeFeedSettings(max_subscribers=10))
+    feed.connected = True
+    everything = feed.subscribe()
+    campus = feed.subscribe(campus_id=1)
+    other = feed.subscribe(campus_id=2)
+
+    feed.dispatch(None, 0, CHANNEL, event(campus_id=1, building_id=5))
+    feed.dispatch(None, 0, CHANNEL, 'not json')
+
+    assert everything.queue.qsize() == 1
+    assert campus.queue.qsize() == 1
+    assert other.queue.empty()
+
+
+def test_subscribing_needs_a_connected_feed_with_room():
+    feed = ChangeFeed(ChangeFeedSettings(max_subscribers=1))
+    with pytest.raises(FeedUnavailable):
+        feed.subscribe()
+    feed.connected = True
+    subscription = feed.subscribe()
+    with pytest.raises(FeedUnavailable):
+        feed.subscribe()
+    feed.unsubscribe(subscription)
+    feed.subscribe()
+
+
+def test_stream_answers_503_without_the_feed(client):
+    response = client.get('/changes/stream')
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == '5'
+
+
+async def notifications_of_room_update(room_id: int) -> list[dict]:
+    from compus.views import room_repository
+    from core.database import database
+
+    received = asyncio.Queue()
+    dsn = make_url(database.settings.url).set(drivername='postgresql').render_as_string(hide_password=False)
+    connection = await asyncpg.connect(dsn)
+    try:
+        await connection.add_listener(CHANNEL, lambda *args: received.put_nowait(json.loads(args[-1])))
+        async with database.session_maker() as session:
+            await room_repository.update(session, room_id, {'name': 'Room 106'})
+        return [await asyncio.wait_for(received.get(), 5)]
+    finally:
+        await connection.close()
+
+
+def test_writes_notify_with_scope(client, rows):
+    notification, = client.portal.call(notifications_of_room_update, rows['room_id'])
+    assert notification == {
+        'entity': 'rooms',
+        'op': 'update',
+        'id': rows['room_id'],
+        'campus_id': rows['campus_id'],
+        'building_id': rows['building_id'],
+    }
@@ -0,0 +1,32 @@
+from prometheus_client import REGISTRY
+
+from core.database import InstrumentedQueuePool
+
+
+class Connection:
+    def close(self) -> None:
+        pass
+
+    def rollback(self) -> None:
+        pass
+
+
+def gauges(engine: str) -> tuple:
+    return (
+        REGISTRY.get_sample_value('db_pool_checked_out', {'engine': engine}),
+        REGISTRY.get_sample_value('db_pool_overflow', {'engine': engine}),
+    )
+
+
+def test_pool_exports_checked_out_and_overflow():
+    pool = InstrumentedQueuePool(Connection, pool_size=1, max_overflow=2, logging_name='test')
+    first = pool.connect()
+    second = pool.connect()
+    assert gauges('test') == (2, 1)
+    assert pool.stats.checkouts == 2
+
+    # the first connection back fills the pool again, the second one over it is closed
+    second.close()
+    assert gauges('test') == (1, 1)
+    first.close()
+    assert gauges('test') == (0, 0)
@@ -0,0 +1,105 @@
+from starlette.requests import Request
+from starlette.responses import Response
+
+from core.etag import ConditionalRequest, make_etag
+
+
+def conditional(if_none_match: str | None = None) -> ConditionalRequest:
+    headers = [] if if_none_match is None else [(b'if-none-match', if_none_match.encode())]
+    request = Request({'type': 'http', 'method': 'GET', 'path': '/room/1', 'query_string': b'', 'headers': headers})
+    return ConditionalRequest(request, Response())
+
+
+def test_etag_is_weak_and_depends_on_version():
+    assert make_etag('a', 1).startswith('W/"')
+    assert make_etag('a', 1) != make_etag('a', 2)
+
+
+def test_without_if_none_match_the_response_is_tagged():
+    check = conditional()
+    assert check.not_modified('1') is None
+    assert check.response.headers['etag'] == check.etag('1')
+
+
+def test_matching_if_none_match_answers_304():
+    etag = conditional().etag('1')
+    # the weak prefix is ignored, lists and * match too
+    for header in (etag, etag.removeprefix('W/'), f'"other", {etag}', '*'):
+        response = conditional(header).not_modified('1')
+        assert response is not None and response.status_code == 304
+        assert response.headers['etag'] == etag
+
+
+def test_stale_if_none_match_answers_200():
+    assert conditional(conditional().etag('1')).not_modified('2') is None
+
+
+def test_by_id_304_until_updated(client, rows):
+    path = f'/room/get_room_by_id/{rows["room_id"]}'
+    etag = client.get(path).headers['etag']
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+
+    client.patch(f'/room/update_room/{rows["room_id"]}', json={'name': 'Room 104'})
+
+    response = client.get(path, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json()['name'] == 'Room 104'
+    assert response.headers['etag'] != etag
+
+
+def test_tree_etag_changes_with_descendants(client, rows):
+    path = f'/logic_query/get_campus_tree/{rows["campus_id"]}'
+    etag = client.get(path).headers['etag']
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+
+    client.delete(f'/room_item/delete_room_item/{rows["room_item_id"]}')
+
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_detached_children_change_etag(client, rows):
+    # ON DELETE SET NULL touches the item, the touch_updated_at trigger gives it a new version
+    path = f'/room_item/get_room_items_by_ids?ids={rows["room_item_id"]}'
+    etag = client.get(path).headers['etag']
+
+    client.delete(f'/request/delete_request/{rows["request_id"]}')
+
+    response = client.get(path, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json()[0]['request_id'] is None
+
+
+def test_rooms_by_ids_etag_follows_parents(client, rows):
+    path = f'/logic_query/get_rooms_by_ids?ids={rows["room_id"]}'
+    etag = client.get(path).headers['etag']
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+
+    client.patch(f'/campus/update_campus/{rows["campus_id"]}', json={'name': 'Campus 2'})
+
+    response = client.get(path, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json()[0]['campus']['name'] == 'Campus 2'
+
+
+def test_inventory_stats_etag_follows_the_summary(client, rows):
+    path = f'/logic_query/get_inventory_stats?campus_id={rows["campus_id"]}'
+    etag = client.get(path).headers['etag']
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+
+    client.patch(f'/room_item/update_room_item/{rows["room_item_id"]}', json={'quantity': 5})
+
+    response = client.get(path, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json()[0]['item_quantity'] == 5
+
+
+def test_search_etag_follows_the_matches(client, rows):
+    path = f'/search/by_name?q=Room&kind=room&building_id={rows["building_id"]}'
+    etag = client.get(path).headers['etag']
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+
+    client.patch(f'/room/update_room/{rows["room_id"]}', json={'name': 'Room 103'})
+
+    response = client.get(path, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'Room 103' in [item['name'] for item in response.json()['items']]
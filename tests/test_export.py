@@ -0,0 +1,36 @@
+import csv
+import io
+import json
+from datetime import date
+
+from compus.export import EXPORT_FIELDS
+
+
+def test_ndjson_export(client, rows):
+    response = client.get('/room_item/export_room_items', params={'campus_id': rows['campus_id']})
+
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    item, = [json.loads(line) for line in response.text.splitlines()]
+    assert item['id'] == rows['room_item_id']
+    assert item['campus_id'] == rows['campus_id']
+    assert item['building_tip'] == 'Labaratoriya'
+    assert item['data'] == date.today().isoformat()
+
+
+def test_csv_export_has_a_header(client, rows):
+    response = client.get('/room_item/export_room_items', params={'campus_id': rows['campus_id'], 'format': 'csv'})
+
+    assert response.headers['content-type'].startswith('text/csv')
+    assert 'room_items.csv' in response.headers['content-disposition']
+    header, *lines = list(csv.reader(io.StringIO(response.text)))
+    assert header == EXPORT_FIELDS
+    assert [int(line[0]) for line in lines] == [rows['room_item_id']]
+
+
+def test_export_filters(client, rows):
+    yesterday = date.fromordinal(date.today().toordinal() - 1).isoformat()
+    response = client.get('/room_item/export_room_items', params={
+        'building_id': rows['building_id'], 'date_to': yesterday,
+    })
+    assert response.text == ''
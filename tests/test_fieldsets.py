@@ -0,0 +1,54 @@
+import pytest
+from fastapi import HTTPException
+
+from compus.schemes import GetRoom
+from core.fieldsets import fieldset_dependency, parse_names
+
+
+def test_unknown_names_are_rejected():
+    with pytest.raises(HTTPException) as error:
+        parse_names('name,colour', ['id', 'name'], 'fields')
+    assert error.value.status_code == 400
+    assert 'colour' in error.value.detail
+
+
+def test_fields_keep_schema_order_and_id():
+    dependency = fieldset_dependency(GetRoom, ['building'])
+    fieldset = dependency(fields='floor, name', include='building,building')
+    assert fieldset.fields == ('id', 'name', 'floor')
+    assert fieldset.includes == ('building',)
+
+
+def test_no_fields_means_all_fields():
+    assert fieldset_dependency(GetRoom, [])(fields=None, include=None).fields == tuple(GetRoom.model_fields)
+
+
+def test_fields_narrow_the_response(client, rows):
+    response = client.get('/room/get_rooms_by_ids', params={'ids': rows['room_id'], 'fields': 'name'})
+    assert response.json() == [{'id': rows['room_id'], 'name': 'Room 101'}]
+
+
+def test_includes_embed_related_rows(client, rows):
+    response = client.get('/room/get_rooms_by_ids', params={
+        'ids': rows['room_id'], 'fields': 'name', 'include': 'building,room_items',
+    })
+    room, = response.json()
+    assert room['building']['id'] == rows['building_id']
+    assert [item['id'] for item in room['room_items']] == [rows['room_item_id']]
+    # the key the include needed is not added to the fields asked for
+    assert 'building_id' not in room
+
+
+def test_includes_change_the_etag(client, rows):
+    params = {'ids': rows['room_id'], 'include': 'room_items'}
+    etag = client.get('/room/get_rooms_by_ids', params=params).headers['etag']
+
+    client.patch(f'/room_item/update_room_item/{rows["room_item_id"]}', json={'quantity': 7})
+
+    response = client.get('/room/get_rooms_by_ids', params=params, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json()[0]['room_items'][0]['quantity'] == 7
+
+
+def test_unknown_include_answers_400(client):
+    assert client.get('/room/get_rooms', params={'include': 'everything'}).status_code == 400
@@ -0,0 +1,62 @@
+from datetime import date
+
+from sqlalchemy import select
+
+from compus.inventory import summary_query
+from compus.models import CampusInventory
+
+
+async def summaries(campus_id: int) -> tuple[list, list]:
+    """The maintained summary rows of a campus and the rows a rebuild would write."""
+    from core.database import database
+
+    async with database.session_maker() as session:
+        maintained = await session.execute(
+            select(
+                CampusInventory.campus_id,
+                CampusInventory.tip,
+                CampusInventory.room_count,
+                CampusInventory.item_quantity,
+                CampusInventory.open_request_count,
+            )
+            .filter(CampusInventory.campus_id == campus_id)
+        )
+        rebuilt = await session.execute(summary_query([campus_id]))
+        return sorted(tuple(row) for row in maintained.all()), sorted(tuple(row) for row in rebuilt.all())
+
+
+def create_room_with_contents(client, building_id: int, name: str) -> int:
+    room_id = client.post('/room/create_room', json={'building_id': building_id, 'name': name, 'floor': 1}).json()['id']
+    today = date.today().isoformat()
+    client.post('/room_item/create_room_items', json=[
+        {'room_id': room_id, 'name': 'Item lamp', 'quantity': quantity, 'data': today, 'status': True}
+        for quantity in (1, 4)
+    ])
+    client.post('/request/create_requests', json=[{'user_id': 5, 'room_id': room_id}] * 2)
+    return room_id
+
+
+def test_writes_keep_the_summary_equal_to_a_rebuild(client, rows):
+    # writes which recompute whole campuses
+    room_id = create_room_with_contents(client, rows['building_id'], 'Room 201')
+    other = client.post(
+        '/building/create_building', json={'campus_id': rows['campus_id'], 'tip': 'Sportzal', 'floors': 1},
+    )
+    client.patch(f'/room/update_room/{rows["room_id"]}', json={'building_id': other.json()['id']})
+    client.delete(f'/room/delete_room/{room_id}')
+    # and writes which only apply deltas afterwards
+    room_id = create_room_with_contents(client, rows['building_id'], 'Room 202')
+    client.patch(f'/room_item/update_room_item/{rows["room_item_id"]}', json={'quantity': 10, 'room_id': room_id})
+    client.patch(f'/request/update_request/{rows["request_id"]}', json={'room_id': room_id})
+    client.delete(f'/room_item/delete_room_item/{rows["room_item_id"]}')
+
+    maintained, rebuilt = client.portal.call(summaries, rows['campus_id'])
+    assert maintained == rebuilt
+
+
+def test_stats_read_the_summary(client, rows):
+    response = client.get('/logic_query/get_inventory_stats', params={'campus_id': rows['campus_id']})
+    stats, = response.json()
+    assert stats['room_count'] == 1
+    assert stats['item_quantity'] == 2
+    assert stats['open_request_count'] == 1
@@ -0,0 +1,42 @@
+import pytest
+from fastapi import HTTPException
+
+from core.pagination import decode_cursor, encode_cursor
+from tests.conftest import insert_rows
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(12345)) == 12345
+
+
+# not base64, and base64 of something which is not an id
+@pytest.mark.parametrize('cursor', ['not a cursor', 'YWJj', ''])
+def test_bad_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_pages_cover_every_row_once(client, rows):
+    for _ in range(2):
+        client.portal.call(insert_rows)
+    seen = []
+    after = None
+    while True:
+        params = {'limit': 2} if after is None else {'limit': 2, 'after': after}
+        response = client.get('/campus/get_campuses', params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page['items']) <= 2
+        seen += [item['id'] for item in page['items']]
+        after = page['next_cursor']
+        if after is None:
+            break
+    assert seen == sorted(set(seen))
+    assert rows['campus_id'] in seen
+
+
+def test_bad_cursor_answers_400(client):
+    response = client.get('/campus/get_campuses', params={'after': 'not a cursor'})
+    assert response.status_code == 400
+
@@ -0,0 +1,142 @@
+"""
+Every route of compus/views.py called against the test database must stay within the
+``query_budget`` it declares. Lists and batches ask for all of their includes, and updates
+write the columns the inventory tracks, so each route runs its most expensive path.
+"""
+from datetime import date
+
+import pytest
+from fastapi import APIRouter
+from fastapi.routing import APIRoute
+
+from compus import views
+
+# stream their rows on a connection of their own, outside of any budget
+UNBUDGETED = {('GET', '/room_item/export_room_items')}
+
+
+def room_item_data(rows: dict) -> dict:
+    return {
+        'request_id': rows['request_id'],
+        'room_id': rows['room_id'],
+        'name': 'Item desk',
+        'quantity': 1,
+        'data': date.today().isoformat(),
+        'status': True,
+    }
+
+
+# request arguments of every route by method and path, path parameters come from the rows fixture
+CASES = {
+    ('GET', '/campus/get_campuses'): lambda rows: {'params': {'include': 'buildings'}},
+    ('GET', '/campus/get_campus_by_id/{about_us_id}'): lambda rows: {},
+    ('GET', '/campus/get_campuses_by_ids'): lambda rows: {
+        'params': {'ids': str(rows['campus_id']), 'include': 'buildings'},
+    },
+    ('POST', '/campus/create_campus'): lambda rows: {'json': {'name': 'New campus', 'address': 'New street 1'}},
+    ('PATCH', '/campus/update_campus/{campus_id}'): lambda rows: {'json': {'name': 'Renamed campus'}},
+    ('DELETE', '/campus/delete_campus/{campus_id}'): lambda rows: {},
+
+    ('GET', '/building/get_buildings'): lambda rows: {'params': {'include': 'campus,rooms'}},
+    ('GET', '/building/get_building_by_id/{building_id}'): lambda rows: {},
+    ('GET', '/building/get_buildings_by_ids'): lambda rows: {
+        'params': {'ids': str(rows['building_id']), 'include': 'campus,rooms'},
+    },
+    ('POST', '/building/create_building'): lambda rows: {
+        'json': {'campus_id': rows['campus_id'], 'tip': 'Kutubxona', 'floors': 2},
+    },
+    ('PATCH', '/building/update_building/{building_id}'): lambda rows: {'json': {'tip': 'Sportzal', 'floors': 4}},
+    ('DELETE', '/building/delete_building/{building_id}'): lambda rows: {},
+
+    ('GET', '/room/get_rooms'): lambda rows: {'params': {'include': 'building,room_items,requests'}},
+    ('GET', '/room/get_room_by_id/{room_id}'): lambda rows: {},
+    ('GET', '/room/get_rooms_by_ids'): lambda rows: {
+        'params': {'ids': str(rows['room_id']), 'include': 'building,room_items,requests'},
+    },
+    ('POST', '/room/create_room'): lambda rows: {
+        'json': {'building_id': rows['building_id'], 'name': 'Room 102', 'floor': 2},
+    },
+    ('POST', '/room/create_rooms'): lambda rows: {
+        'json': [{'building_id': rows['building_id'], 'name': f'Room 2{index:02}', 'floor': 2} for index in range(3)],
+    },
+    ('PATCH', '/room/update_room/{room_id}'): lambda rows: {
+        'json': {'building_id': rows['building_id'], 'name': 'Room 103', 'floor': 3},
+    },
+    ('DELETE', '/room/delete_room/{room_id}'): lambda rows: {},
+
+    ('GET', '/room_item/get_room_items'): lambda rows: {'params': {'include': 'room,request'}},
+    ('GET', '/room_item/export_room_items'): lambda rows: {'params': {'campus_id': rows['campus_id']}},
+    ('GET', '/room_item/get_room_item_by_id/{room_item_id}'): lambda rows: {},
+    ('GET', '/room_item/get_room_items_by_ids'): lambda rows: {
+        'params': {'ids': str(rows['room_item_id']), 'include': 'room,request'},
+    },
+    ('POST', '/room_item/create_room_item'): lambda rows: {'json': room_item_data(rows)},
+    ('POST', '/room_item/create_room_items'): lambda rows: {'json': [room_item_data(rows) for _ in range(3)]},
+    ('PATCH', '/room_item/update_room_item/{room_item_id}'): lambda rows: {'json': {'quantity': 5, 'status': False}},
+    ('DELETE', '/room_item/delete_room_item/{room_item_id}'): lambda rows: {},
+
+    ('GET', '/request/get_requests'): lambda rows: {'params': {'include': 'room,room_items'}},
+    ('GET', '/request/get_request_by_id/{request_id}'): lambda rows: {},
+    ('GET', '/request/get_requests_by_ids'): lambda rows: {
+        'params': {'ids': str(rows['request_id']), 'include': 'room,room_items'},
+    },
+    ('POST', '/request/create_request'): lambda rows: {'json': {'user_id': 2, 'room_id': rows['room_id']}},
+    ('POST', '/request/submit_request'): lambda rows: {'json': {'user_id': 2, 'room_id': rows['room_id']}},
+    ('POST', '/request/create_requests'): lambda rows: {
+        'json': [{'user_id': user_id, 'room_id': rows['room_id']} for user_id in range(3)],
+    },
+    ('PATCH', '/request/update_request/{request_id}'): lambda rows: {
+        'json': {'user_id': 3, 'room_id': rows['room_id']},
+    },
+    ('DELETE', '/request/delete_request/{request_id}'): lambda rows: {},
+
+    ('GET', '/logic_query/get_rooms/{building_id}'): lambda rows: {},
+    ('GET', '/logic_query/get_building_summary/{building_id}'): lambda rows: {},
+    ('GET', '/logic_query/get_room/{room_id}'): lambda rows: {},
+    ('GET', '/logic_query/get_campus_tree/{campus_id}'): lambda rows: {},
+    ('GET', '/logic_query/get_rooms_by_ids'): lambda rows: {'params': {'ids': str(rows['room_id'])}},
+    ('GET', '/logic_query/get_inventory_stats'): lambda rows: {'params': {'campus_id': rows['campus_id']}},
+
+    ('GET', '/search/by_name'): lambda rows: {'params': {'q': 'Item'}},
+}
+
+
+def view_routes() -> dict[tuple[str, str], APIRoute]:
+    routes = {}
+    for router in vars(views).values():
+        if isinstance(router, APIRouter):
+            for route in router.routes:
+                for method in route.methods:
+                    routes[method, route.path] = route
+    return routes
+
+
+def route_budget(route: APIRoute):
+    for depends in route.dependencies:
+        budget = getattr(depends.dependency, 'budget', None)
+        if budget is not None:
+            return budget
+    return None
+
+
+ROUTES = view_routes()
+
+
+def test_every_route_has_a_case():
+    assert set(ROUTES) == set(CASES)
+
+
+@pytest.mark.parametrize('method, path', sorted(set(ROUTES) - UNBUDGETED))
+def test_route_declares_budget(method, path):
+    assert route_budget(ROUTES[method, path]) is not None
+
+
+@pytest.mark.parametrize('method, path', sorted(CASES))
+def test_route_within_budget(client, recorder, rows, method, path):
+    response = client.request(method, path.format(**rows), **CASES[method, path](rows))
+
+    assert response.status_code < 400, response.text
+    budget = route_budget(ROUTES[method, path])
+    if budget is not None:
+        # strict budgets already raise inside the route, this also reports the actual count
+        assert recorder.stats.count <= budget, f'{recorder.stats.count} SQL statements, budget is {budget}'
@@ -0,0 +1,170 @@
+import asyncio
+import json
+
+import pytest
+
+from core.write_behind import BufferFull, WriteBehindBuffer
+from settings import settings
+
+
+class Table:
+    """Target of the buffer: ids taken from a counter, rows kept by id, inserts fail while ``failing``."""
+
+    def __init__(self) -> None:
+        self.rows: dict[int, dict] = {}
+        self.last_id = 0
+        self.failing = False
+        self.flushes = 0
+
+    async def reserve_ids(self, count: int) -> list[int]:
+        ids = list(range(self.last_id + 1, self.last_id + count + 1))
+        self.last_id += count
+        return ids
+
+    async def flush(self, rows: list[dict]) -> int:
+        self.flushes += 1
+        if self.failing:
+            raise ConnectionError('database is down')
+        new = [row for row in rows if row['id'] not in self.rows]
+        self.rows.update((row['id'], row) for row in new)
+        return len(new)
+
+
+def make_buffer(table: Table, spool_dir, max_rows: int = 3, max_buffer: int = 10) -> WriteBehindBuffer:
+    return WriteBehindBuffer(
+        name='test',
+        flush=table.flush,
+        reserve_ids=table.reserve_ids,
+        flush_interval=60,
+        max_rows=max_rows,
+        max_buffer=max_buffer,
+        spool_dir=spool_dir,
+    )
+
+
+def test_ids_are_final_and_ascending(tmp_path):
+    async def scenario():
+        table = Table()
+        buffer = make_buffer(table, tmp_path)
+        await buffer.start()
+        rows = [await buffer.submit({'n': n}) for n in range(5)]
+        await buffer.stop()
+        return table, rows
+
+    table, rows = asyncio.run(scenario())
+    assert [row['id'] for row in rows] == [1, 2, 3, 4, 5]
+    assert {row_id: row['n'] for row_id, row in table.rows.items()} == {1: 0, 2: 1, 3: 2, 4: 3, 5: 4}
+    # five rows in batches of three
+    assert table.flushes == 2
+
+
+def test_full_buffer_rejects(tmp_path):
+    async def scenario():
+        buffer = make_buffer(Table(), tmp_path, max_rows=10, max_buffer=2)
+        await buffer.start()
+        await buffer.submit({})
+        await buffer.submit({})
+        with pytest.raises(BufferFull):
+            await buffer.submit({})
+        await buffer.stop()
+
+    asyncio.run(scenario())
+
+
+def test_reaching_max_rows_flushes_before_the_interval(tmp_path):
+    async def scenario():
+        table = Table()
+        buffer = make_buffer(table, tmp_path)
+        await buffer.start()
+        for n in range(3):
+            await buffer.submit({'n': n})
+        for _ in range(100):
+            if table.rows:
+                break
+            await asyncio.sleep(0.01)
+        flushed = len(table.rows)
+        await buffer.stop()
+        return flushed
+
+    assert asyncio.run(scenario()) == 3
+
+
+def test_stop_flushes_the_rest(tmp_path):
+    async def scenario():
+        table = Table()
+        buffer = make_buffer(table, tmp_path)
+        await buffer.start()
+        await buffer.submit({'n': 0})
+        await buffer.stop()
+        return table
+
+    assert list(asyncio.run(scenario()).rows) == [1]
+
+
+def test_rows_are_rejected_outside_start_and_stop(tmp_path):
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await make_buffer(Table(), tmp_path).submit({})
+
+    asyncio.run(scenario())
+
+
+def test_buffer_restarts_under_a_new_loop(tmp_path):
+    table = Table()
+    buffer = make_buffer(table, tmp_path)
+
+    async def lifespan(n: int):
+        await buffer.start()
+        await buffer.submit({'n': n})
+        # lets the flush loop wait on the event
+        await asyncio.sleep(0.01)
+        await buffer.stop()
+
+    # like two test clients, or a restarted server, running the same module-level buffer
+    asyncio.run(lifespan(0))
+    asyncio.run(lifespan(1))
+    assert [row['n'] for row in table.rows.values()] == [0, 1]
+
+
+def test_failed_batches_are_spooled_and_replayed_once(tmp_path):
+    async def scenario():
+        table = Table()
+        buffer = make_buffer(table, tmp_path, max_rows=10)
+        await buffer.start()
+        for n in range(4):
+            await buffer.submit({'n': n})
+        table.failing = True
+        assert not await buffer.flush_buffered()
+        spooled = [json.loads(line) for path in tmp_path.glob('test-*.jsonl') for line in path.read_text().splitlines()]
+
+        table.failing = False
+        # a row of the spool which made it in before must not be inserted twice
+        table.rows[1] = {'id': 1, 'n': 0}
+        await buffer.replay_spool()
+        await buffer.stop()
+        return table, spooled
+
+    table, spooled = asyncio.run(scenario())
+    assert [row['id'] for row in spooled] == [1, 2, 3, 4]
+    assert sorted(table.rows) == [1, 2, 3, 4]
+    assert not list(tmp_path.iterdir())
+
+
+def test_replay_keeps_failing_files(tmp_path):
+    async def scenario():
+        table = Table()
+        buffer = make_buffer(table, tmp_path)
+        buffer.write_spool([{'id': 7, 'n': 0}])
+        table.failing = True
+        await buffer.replay_spool()
+
+    asyncio.run(scenario())
+    assert len(list(tmp_path.glob('test-*.jsonl'))) == 1
+    assert not list(tmp_path.glob('*.replaying-*'))
+
+
+def test_submit_answers_201_when_inserted_right_away(client, rows, monkeypatch):
+    monkeypatch.setattr(settings.write_behind, 'enabled', False)
+    response = client.post('/request/submit_request', json={'user_id': 3, 'room_id': rows['room_id']})
+    assert response.status_code == 201
+    assert response.json()['queued'] is False
@@ -0,0 +1,229 @@
+"""
+Load benchmark of the compus endpoints.
+
+Seed a local database first (python -m tools.seed), start the app, then:
+
+    python -m tools.bench --base-url http://localhost:8000 --concurrency 32 --duration 20 --output bench.json
+
+Every scenario is driven by ``--concurrency`` async clients for ``--duration`` seconds.
+The report has p50/p95/p99 latency, throughput and error counts per scenario,
+plus the git commit, so runs can be diffed between commits.
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable
+
+import httpx
+from sqlalchemy import func, select
+
+from compus.models import (
+    Campus,
+    Building,
+    Room,
+    RoomItems,
+    Request,
+)
+from core.database import database
+from core.pagination import encode_cursor
+
+
+@dataclass
+class IdRange:
+    low: int
+    high: int
+
+    def pick(self, rnd: random.Random) -> int:
+        return rnd.randint(self.low, self.high)
+
+
+@dataclass
+class Scenario:
+    name: str
+    # builds (method, url, json body) from the id ranges of the seeded tables
+    request: Callable[[random.Random, dict], tuple[str, str, dict | None]]
+    write: bool = False
+
+
+@dataclass
+class Result:
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: dict[int, int] = field(default_factory=dict)
+
+
+def get(path: str) -> Callable[[random.Random, dict], tuple[str, str, None]]:
+    def build(rnd: random.Random, ids: dict) -> tuple[str, str, None]:
+        return 'GET', path.format(**{name: id_range.pick(rnd) for name, id_range in ids.items()}), None
+    return build
+
+
+def deep_page(path: str, model_name: str) -> Callable[[random.Random, dict], tuple[str, str, None]]:
+    def build(rnd: random.Random, ids: dict) -> tuple[str, str, None]:
+        return 'GET', f'{path}?after={encode_cursor(ids[model_name].pick(rnd))}', None
+    return build
+
+
+def create_request(rnd: random.Random, ids: dict) -> tuple[str, str, dict]:
+    return 'POST', '/request/create_request', {'user_id': rnd.randint(1, 20_000), 'room_id': ids['room'].pick(rnd)}
+
+
+SCENARIOS = [
+    Scenario('campus list', get('/campus/get_campuses')),
+    Scenario('campus by id', get('/campus/get_campus_by_id/{campus}')),
+    Scenario('building list', get('/building/get_buildings')),
+    Scenario('building by id', get('/building/get_building_by_id/{building}')),
+    Scenario('room list', get('/room/get_rooms')),
+    Scenario('room list deep page', deep_page('/room/get_rooms', 'room')),
+    Scenario('room by id', get('/room/get_room_by_id/{room}')),
+    Scenario('room item list', get('/room_item/get_room_items')),
+    Scenario('room item list deep page', deep_page('/room_item/get_room_items', 'room_item')),
+    Scenario('room item by id', get('/room_item/get_room_item_by_id/{room_item}')),
+    Scenario('request list', get('/request/get_requests')),
+    Scenario('request by id', get('/request/get_request_by_id/{request}')),
+    Scenario('logic building rooms', get('/logic_query/get_rooms/{building}')),
+    Scenario('logic building rooms by floor', get('/logic_query/get_rooms/{building}?floor=1')),
+    Scenario('logic building summary', get('/logic_query/get_building_summary/{building}')),
+    Scenario('logic room', get('/logic_query/get_room/{room}')),
+    Scenario('logic room database json', get('/logic_query/get_room/{room}?assembly=database')),
+    Scenario('logic campus tree', get('/logic_query/get_campus_tree/{campus}')),
+    Scenario('search by name', get('/search/by_name?q=Item 4')),
+    Scenario('search by name broad', get('/search/by_name?q=Item&offset=20')),
+    Scenario('search by name in building', get('/search/by_name?q=Room&building_id={building}')),
+    Scenario('create request', create_request, write=True),
+]
+
+
+def percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def load_id_ranges() -> dict[str, IdRange]:
+    models = {
+        'campus': Campus,
+        'building': Building,
+        'room': Room,
+        'room_item': RoomItems,
+        'request': Request,
+    }
+    ranges = {}
+    async with database.engine.connect() as connection:
+        for name, model in models.items():
+            result = await connection.execute(select(func.min(model.id), func.max(model.id)))
+            low, high = result.one()
+            if low is None:
+                raise SystemExit(f'{model.__tablename__} is empty, run python -m tools.seed first')
+            ranges[name] = IdRange(low, high)
+    await database.dispose()
+    return ranges
+
+
+async def run_scenario(
+        client: httpx.AsyncClient,
+        scenario: Scenario,
+        ids: dict,
+        concurrency: int,
+        duration: float,
+        seed: int) -> dict:
+    result = Result()
+    deadline = time.perf_counter() + duration
+
+    async def worker(worker_id: int) -> None:
+        rnd = random.Random(seed * 1000 + worker_id)
+        while time.perf_counter() < deadline:
+            method, url, body = scenario.request(rnd, ids)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=body)
+            except httpx.HTTPError:
+                result.errors += 1
+                continue
+            result.latencies.append(time.perf_counter() - start)
+            result.statuses[response.status_code] = result.statuses.get(response.status_code, 0) + 1
+            if response.status_code >= 500:
+                result.errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(worker_id) for worker_id in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies_ms = [latency * 1000 for latency in result.latencies]
+    return {
+        'requests': len(result.latencies),
+        'errors': result.errors,
+        'statuses': {str(code): count for code, count in sorted(result.statuses.items())},
+        'throughput_rps': round(len(result.latencies) / elapsed, 2),
+        'p50_ms': round(percentile(latencies_ms, 50), 3),
+        'p95_ms': round(percentile(latencies_ms, 95), 3),
+        'p99_ms': round(percentile(latencies_ms, 99), 3),
+        'max_ms': round(max(latencies_ms, default=0.0), 3),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args: argparse.Namespace) -> None:
+    ids = await load_id_ranges()
+    scenarios = [
+        scenario for scenario in SCENARIOS
+        if (args.writes or not scenario.write) and (not args.only or scenario.name in args.only)
+    ]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    report = {
+        'commit': git_commit(),
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'base_url': args.base_url,
+        'concurrency': args.concurrency,
+        'duration_s': args.duration,
+        'seed': args.seed,
+        'scenarios': {},
+    }
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        for scenario in scenarios:
+            if args.warmup:
+                await run_scenario(client, scenario, ids, args.concurrency, args.warmup, args.seed)
+            stats = await run_scenario(client, scenario, ids, args.concurrency, args.duration, args.seed)
+            report['scenarios'][scenario.name] = stats
+            print(
+                f'{scenario.name:32} {stats["throughput_rps"]:>9} rps  '
+                f'p50 {stats["p50_ms"]:>8} ms  p95 {stats["p95_ms"]:>8} ms  '
+                f'p99 {stats["p99_ms"]:>8} ms  errors {stats["errors"]}'
+            )
+
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2)
+    print(f'report written to {args.output}')
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=20, help='seconds per scenario')
+    parser.add_argument('--warmup', type=float, default=3, help='unrecorded seconds before every scenario')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--writes', action='store_true', help='include scenarios which write')
+    parser.add_argument('--only', nargs='*', help='scenario names to run')
+    parser.add_argument('--output', default='bench.json')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,185 @@
+"""
+EXPLAIN regression check for the hot queries behind compus/views.py.
+
+Run it against a seeded local database:
+
+    python -m tools.explain_check
+
+Exits with status 1 when any hot query falls back to a Seq Scan on one of
+the large tables it is expected to reach through an index, or sorts the rows
+of a table it is expected to read in index order.
+"""
+import asyncio
+import json
+import sys
+from dataclasses import dataclass
+from typing import Iterator
+
+from sqlalchemy import Select, select, text
+from sqlalchemy.dialects.postgresql import asyncpg
+
+from compus.models import (
+    Building,
+    Room,
+    RoomItems,
+    Request,
+)
+from compus.json_tree import room_json_query
+from compus.search import name_search_query
+from core.database import database
+
+
+@dataclass
+class ExplainCase:
+    name: str
+    query: Select
+    # relations which must never be read with a sequential scan
+    tables: tuple[str, ...]
+    # relations which must be read by an index scan returning rows in the order asked for,
+    # so a top-k stops after k rows instead of sorting every match
+    ordered: tuple[str, ...] = ()
+
+
+HOT_QUERIES = [
+    ExplainCase(
+        '/room/get_rooms',
+        select(Room).filter(Room.id > 1000).order_by(Room.id).limit(51),
+        ('rooms',),
+    ),
+    ExplainCase(
+        '/room/get_room_by_id',
+        select(Room).filter(Room.id == 1),
+        ('rooms',),
+    ),
+    ExplainCase(
+        '/room_item/get_room_items',
+        select(RoomItems).filter(RoomItems.id > 1000).order_by(RoomItems.id).limit(51),
+        ('room_items',),
+    ),
+    ExplainCase(
+        '/room_item/get_room_item_by_id',
+        select(RoomItems).filter(RoomItems.id == 1),
+        ('room_items',),
+    ),
+    ExplainCase(
+        '/request/get_requests',
+        select(Request).filter(Request.id > 1000).order_by(Request.id).limit(51),
+        ('requests',),
+    ),
+    ExplainCase(
+        '/request/by_user',
+        select(Request).filter(Request.user_id == 1),
+        ('requests',),
+    ),
+    ExplainCase(
+        '/logic_query/get_rooms/{building_id}',
+        select(Room).filter(Room.building_id == 1),
+        ('rooms',),
+    ),
+    ExplainCase(
+        '/logic_query/get_rooms/{building_id}?floor=',
+        select(Room).filter(Room.building_id == 1, Room.floor == 1),
+        ('rooms',),
+    ),
+    ExplainCase(
+        'selectin Room.room_items',
+        select(RoomItems).filter(RoomItems.room_id.in_([1, 2, 3])),
+        ('room_items',),
+    ),
+    ExplainCase(
+        'selectin Room.requests',
+        select(Request).filter(Request.room_id.in_([1, 2, 3])),
+        ('requests',),
+    ),
+    ExplainCase(
+        'selectin Request.room_items',
+        select(RoomItems).filter(RoomItems.request_id.in_([1, 2, 3])),
+        ('room_items',),
+    ),
+    ExplainCase(
+        'selectin Building.rooms',
+        select(Room).filter(Room.building_id.in_([1, 2, 3])),
+        ('rooms',),
+    ),
+    ExplainCase(
+        'selectin Campus.buildings',
+        select(Building).filter(Building.campus_id.in_([1, 2, 3])),
+        (),
+    ),
+    ExplainCase(
+        '/logic_query/get_room/{room_id}?assembly=database',
+        room_json_query(1),
+        ('rooms', 'room_items'),
+    ),
+    ExplainCase(
+        '/search/by_name',
+        name_search_query('proj').limit(21),
+        ('rooms', 'room_items'),
+    ),
+    ExplainCase(
+        '/search/by_name?building_id=',
+        name_search_query('proj', building_id=1).limit(21),
+        ('rooms', 'room_items'),
+    ),
+    ExplainCase(
+        '/search/by_name?q=<2 characters>',
+        name_search_query('pr').limit(21),
+        ('rooms', 'room_items'),
+    ),
+    # matches every seeded item, the top rows must come nearest first from the gist index
+    ExplainCase(
+        '/search/by_name?q=<broad>',
+        name_search_query('Item', top=41).limit(21).offset(20),
+        ('rooms', 'room_items'),
+        ordered=('room_items',),
+    ),
+]
+
+
+def iter_plan_nodes(node: dict) -> Iterator[dict]:
+    yield node
+    for child in node.get('Plans', []):
+        yield from iter_plan_nodes(child)
+
+
+def compile_query(query: Select) -> str:
+    return str(query.compile(dialect=asyncpg.dialect(), compile_kwargs={'literal_binds': True}))
+
+
+def is_ordered_scan(node: dict) -> bool:
+    # Index Cond alone is a filter, Order By means the index returns the rows in distance order
+    return node['Node Type'] in ('Index Scan', 'Index Only Scan') and 'Order By' in node
+
+
+async def explain(case: ExplainCase, connection) -> list[str]:
+    """Problems of the plan of ``case``, empty when it is fine."""
+    result = await connection.execute(text(f'EXPLAIN (FORMAT JSON) {compile_query(case.query)}'))
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    problems = []
+    for node in iter_plan_nodes(plan[0]['Plan']):
+        relation = node.get('Relation Name')
+        if node['Node Type'] == 'Seq Scan' and relation in case.tables:
+            problems.append(f'Seq Scan on {relation}')
+        elif relation in case.ordered and not is_ordered_scan(node):
+            problems.append(f'{node["Node Type"]} on {relation} is not in index order')
+    return problems
+
+
+async def main() -> int:
+    failures = 0
+    async with database.engine.connect() as connection:
+        for case in HOT_QUERIES:
+            problems = await explain(case, connection)
+            if problems:
+                failures += 1
+                print(f'FAIL  {case.name}: {", ".join(problems)}')
+            else:
+                print(f'ok    {case.name}')
+    await database.dispose()
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
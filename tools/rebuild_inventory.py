@@ -0,0 +1,34 @@
+"""
+Recomputes the campus inventory summary from the rooms, room_items and requests tables.
+
+    python -m tools.rebuild_inventory              # every campus
+    python -m tools.rebuild_inventory --campus 3 7
+
+Run it after bulk loads which bypass the API, or to repair drift.
+"""
+import argparse
+import asyncio
+import time
+
+from compus.inventory import rebuild_inventory
+from core.database import database
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--campus', type=int, nargs='*', help='campus ids to rebuild, all when omitted')
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> None:
+    start = time.perf_counter()
+    async with database.session_maker() as session:
+        await rebuild_inventory(session, args.campus or None)
+        await session.commit()
+    await database.dispose()
+    scope = ', '.join(map(str, args.campus)) if args.campus else 'all campuses'
+    print(f'rebuilt inventory summary of {scope} in {time.perf_counter() - start:.1f}s')
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,151 @@
+"""
+Synthetic campus -> building -> room -> room_item -> request data for local benchmarks.
+
+    python -m tools.seed --campuses 20 --buildings 500 --rooms 100000 --items 2000000
+
+Rows are written with COPY in chunks, ids continue after the existing ones
+and sequences are moved past them, so the API keeps working on top of the seed.
+The same --seed always produces the same data.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, timedelta
+from typing import Iterator
+
+from compus.inventory import rebuild_inventory
+from compus.models import BuildingTip
+from core.database import database
+
+CHUNK_SIZE = 50_000
+TABLES = ('campuses', 'buildings', 'rooms', 'requests', 'room_items', 'campus_inventory_summary')
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--campuses', type=int, default=20)
+    parser.add_argument('--buildings', type=int, default=500)
+    parser.add_argument('--rooms', type=int, default=100_000)
+    parser.add_argument('--items', type=int, default=2_000_000)
+    parser.add_argument('--requests', type=int, default=200_000)
+    parser.add_argument('--users', type=int, default=20_000, help='distinct user ids of requests')
+    parser.add_argument('--max-floors', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--truncate', action='store_true', help='empty the compus tables first')
+    return parser.parse_args()
+
+
+def chunks(rows: Iterator[tuple], size: int = CHUNK_SIZE) -> Iterator[list[tuple]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def copy_rows(driver, table: str, columns: list[str], rows: Iterator[tuple]) -> int:
+    total = 0
+    for chunk in chunks(rows):
+        await driver.copy_records_to_table(table, records=chunk, columns=columns)
+        total += len(chunk)
+    return total
+
+
+async def next_id(driver, table: str) -> int:
+    return await driver.fetchval(f'SELECT coalesce(max(id), 0) + 1 FROM {table}')
+
+
+async def seed(args: argparse.Namespace) -> None:
+    rnd = random.Random(args.seed)
+    tips = [tip.name for tip in BuildingTip]
+    first_day = date(2024, 9, 1)
+
+    async with database.engine.connect() as connection:
+        raw = await connection.get_raw_connection()
+        # plain asyncpg connection outside of a SQLAlchemy transaction, every COPY commits on its own
+        driver = raw.driver_connection
+        # nobody needs millions of change notifications, see the change feed triggers
+        await driver.execute("SET change_feed.disabled = 'on'")
+
+        if args.truncate:
+            await driver.execute(f'TRUNCATE {", ".join(TABLES)} RESTART IDENTITY CASCADE')
+
+        start = time.perf_counter()
+        campus_start = await next_id(driver, 'campuses')
+        campus_ids = range(campus_start, campus_start + args.campuses)
+        await copy_rows(driver, 'campuses', ['id', 'name', 'address'], (
+            (campus_id, f'Campus {campus_id}', f'Street {campus_id}') for campus_id in campus_ids
+        ))
+
+        building_start = await next_id(driver, 'buildings')
+        building_floors = {
+            building_id: rnd.randint(1, args.max_floors)
+            for building_id in range(building_start, building_start + args.buildings)
+        }
+        await copy_rows(driver, 'buildings', ['id', 'campus_id', 'tip', 'floors'], (
+            (building_id, rnd.choice(campus_ids), rnd.choice(tips), floors)
+            for building_id, floors in building_floors.items()
+        ))
+
+        building_ids = list(building_floors)
+        room_start = await next_id(driver, 'rooms')
+        room_ids = range(room_start, room_start + args.rooms)
+
+        def rooms() -> Iterator[tuple]:
+            for room_id in room_ids:
+                building_id = rnd.choice(building_ids)
+                yield room_id, building_id, f'Room {room_id}', rnd.randint(1, building_floors[building_id])
+
+        await copy_rows(driver, 'rooms', ['id', 'building_id', 'name', 'floor'], rooms())
+
+        request_start = await next_id(driver, 'requests')
+        request_ids = range(request_start, request_start + args.requests)
+        await copy_rows(driver, 'requests', ['id', 'user_id', 'room_id'], (
+            (request_id, rnd.randint(1, args.users), rnd.choice(room_ids)) for request_id in request_ids
+        ))
+
+        item_start = await next_id(driver, 'room_items')
+
+        def room_items() -> Iterator[tuple]:
+            for item_id in range(item_start, item_start + args.items):
+                request_id = rnd.choice(request_ids) if request_ids and rnd.random() < 0.1 else None
+                yield (
+                    item_id,
+                    rnd.choice(room_ids),
+                    request_id,
+                    f'Item {item_id % 500}',
+                    rnd.randint(0, 50),
+                    first_day + timedelta(days=rnd.randint(0, 365)),
+                    rnd.random() < 0.8,
+                )
+
+        await copy_rows(
+            driver, 'room_items',
+            ['id', 'room_id', 'request_id', 'name', 'quantity', 'data', 'status'],
+            room_items(),
+        )
+
+        # COPY bypasses the write handlers which maintain the summary
+        async with database.session_maker() as session:
+            await rebuild_inventory(session)
+            await session.commit()
+
+        for table in TABLES:
+            await driver.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 1)) FROM {table}"
+            )
+            await driver.execute(f'ANALYZE {table}')
+
+        print(
+            f'seeded {args.campuses} campuses, {args.buildings} buildings, {args.rooms} rooms, '
+            f'{args.requests} requests and {args.items} room items in {time.perf_counter() - start:.1f}s'
+        )
+    await database.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(seed(parse_args()))